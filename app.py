@@ -1,25 +1,187 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session, g
+from flask import (Flask, Response, request, jsonify, render_template, redirect, url_for, session, g, has_app_context,
+                   stream_with_context)
+from flask.logging import default_handler
+import click
 from flask_login import LoginManager, UserMixin, login_user, login_required, logout_user, current_user
 import chess
 import chess.engine
+import chess.polyglot
+import io
+import itertools
 import os
 import sqlite3
 import json
+import struct
 from datetime import datetime, timedelta
+from urllib.parse import urlsplit
+from collections import OrderedDict
 from werkzeug.security import generate_password_hash, check_password_hash
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
 import logging
-from logging.handlers import RotatingFileHandler
+import atexit
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from engine_pool import (EnginePool, EngineUnavailableError, EngineBusyError, play_until_stable, play_with_lines,
+                         PRIORITY_MOVE, PRIORITY_HINT, PRIORITY_EVAL, PRIORITY_ANALYSIS, PRIORITY_PONDER)
+from engine_service import RemoteEnginePool, authkey_path, load_authkey
+from assets import AssetPipeline, AssetMiddleware, audio_asset, data_uri, minify_css, minify_js
+from eval_cache import EvalCache, CachedEval
+from game_review import review_move, score_json, summarize, terminal_eval
+from game_events import GameEvents
+from pgn_io import game_pgn, read_games
+from move_sources import OpeningBook, Tablebase, TABLEBASE_WIN_CP
+from metrics import REGISTRY, SlowRequestProfiler
+from log_pipeline import Lazy, parse_settings, start_logging
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key'  # Replace with a secure key in production
 
-# Set up logging
-handler = RotatingFileHandler('app.log', maxBytes=1000000, backupCount=5)
-handler.setLevel(logging.INFO)
-app.logger.addHandler(handler)
-app.logger.setLevel(logging.INFO)
+# Set up logging. Records go through a queue to a background thread that writes JSON lines to
+# LOG_FILE (and the console), so request threads never wait on disk. Per-move, per-hint and
+# persistence traces have their own categories (app.moves, app.hints, app.db) that can be
+# levelled or sampled separately, e.g. LOG_LEVELS="app.moves=WARNING" or
+# LOG_SAMPLE="app.moves=0.05,app.hints=0.2".
+app.config['LOG_FILE'] = os.environ.get('LOG_FILE', 'app.log')
+app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'INFO').upper()
+app.config['LOG_LEVELS'] = parse_settings(os.environ.get('LOG_LEVELS'), str.upper)
+app.config['LOG_SAMPLE'] = parse_settings(os.environ.get('LOG_SAMPLE'), float)
+app.config['LOG_QUEUE_SIZE'] = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+app.config['LOG_CONSOLE'] = os.environ.get('LOG_CONSOLE', '1') == '1'
+
+def log_context():
+    if not has_app_context():
+        return {}
+    return {'request_id': g.get('request_id'), 'game_id': g.get('game_id')}
+
+# Flask's console handler is moved behind the queue too
+app.logger.removeHandler(default_handler)
+log_handler, log_listener = start_logging(
+    [app.logger] + [logging.getLogger(name) for name in ('engine_pool', 'eval_cache', 'move_sources', 'metrics')],
+    app.config['LOG_FILE'], level=app.config['LOG_LEVEL'], levels=app.config['LOG_LEVELS'],
+    sample_rates=app.config['LOG_SAMPLE'], queue_size=app.config['LOG_QUEUE_SIZE'],
+    console_handler=default_handler if app.config['LOG_CONSOLE'] else None, context=log_context)
+atexit.register(log_listener.stop)
+move_log = app.logger.getChild('moves')
+hint_log = app.logger.getChild('hints')
+db_log = app.logger.getChild('db')
+
+# Timings for the hot paths, exposed on /metrics together with the component stats collected there
+HTTP_REQUEST_SECONDS = REGISTRY.histogram('chess_http_request_seconds', 'Time to handle a request', ['endpoint', 'method'])
+HTTP_REQUESTS = REGISTRY.counter('chess_http_requests_total', 'Requests handled', ['endpoint', 'method', 'status'])
+ENGINE_SEARCH_SECONDS = REGISTRY.histogram('chess_engine_search_seconds', 'Time spent in one engine search', ['kind'])
+DB_OPERATION_SECONDS = REGISTRY.histogram('chess_db_operation_seconds', 'Time spent in a database operation', ['operation'])
+DB_LOCK_WAIT_SECONDS = REGISTRY.histogram('chess_db_lock_wait_seconds', 'Time spent waiting for the SQLite write lock',
+                                          ['operation'])
+SLOW_REQUESTS = REGISTRY.counter('chess_slow_requests_total', 'Requests slower than the profiling threshold', ['endpoint'])
+
+# Stockfish engine pool, shared by every request thread in this process
+app.config['ENGINE_PATH'] = os.environ.get('STOCKFISH_PATH', "./stockfish.exe" if os.name == 'nt' else "./stockfish")
+app.config['ENGINE_POOL_SIZE'] = int(os.environ.get('ENGINE_POOL_SIZE', 2))
+app.config['ENGINE_QUEUE_LIMIT'] = int(os.environ.get('ENGINE_QUEUE_LIMIT', 16))
+# With several web worker processes, point them all at one engine_service.py socket instead
+# of each spawning its own engines. Games, AI jobs and event streams stay per process, so those
+# processes must sit behind sticky sessions (see README)
+app.config['ENGINE_SERVICE'] = os.environ.get('ENGINE_SERVICE') or None
+# Without ENGINE_SERVICE_AUTHKEY, the key the service wrote next to its socket is used
+app.config['ENGINE_SERVICE_AUTHKEY'] = os.environ.get('ENGINE_SERVICE_AUTHKEY') or None
+if app.config['ENGINE_SERVICE']:
+    engine_pool = RemoteEnginePool(app.config['ENGINE_SERVICE'], app.config['ENGINE_SERVICE_AUTHKEY']
+                                   or load_authkey(authkey_path(app.config['ENGINE_SERVICE'])))
+else:
+    engine_pool = EnginePool(app.config['ENGINE_PATH'], size=app.config['ENGINE_POOL_SIZE'],
+                             max_waiting=app.config['ENGINE_QUEUE_LIMIT'])
+# python-chess runs each engine on a non-daemon thread, so the pool must be closed before
+# the interpreter joins threads at shutdown (plain atexit handlers run too late for that)
+getattr(threading, '_register_atexit', atexit.register)(engine_pool.close)
+
+# Search budget for each difficulty. The search stops at whichever of nodes/depth/movetime is
+# reached first (None = no limit). With stable_depths set, a full-strength search also stops
+# once the best move has stayed the same for that many depths past min_depth. min_depth is
+# also the shallowest cached evaluation a game at that level will accept.
+# Override with DIFFICULTY_PROFILES='{"Hard": {"movetime": 1.0, "threads": 2}}'.
+DIFFICULTY_PROFILES = {
+    'Easy': {'skill_level': 5, 'nodes': 20000, 'depth': None, 'movetime': None,
+             'hash': 16, 'threads': 1, 'stable_depths': 0, 'min_depth': 0},
+    'Medium': {'skill_level': 10, 'nodes': None, 'depth': 12, 'movetime': 0.25,
+               'hash': 16, 'threads': 1, 'stable_depths': 0, 'min_depth': 8},
+    'Hard': {'skill_level': 20, 'nodes': None, 'depth': None, 'movetime': 0.5,
+             'hash': 64, 'threads': 1, 'stable_depths': 5, 'min_depth': 14},
+}
+for level, overrides in json.loads(os.environ.get('DIFFICULTY_PROFILES', '{}')).items():
+    DIFFICULTY_PROFILES.setdefault(level, dict(DIFFICULTY_PROFILES['Medium'])).update(overrides)
+
+# How long each kind of work may queue for an engine before giving up. AI replies are what
+# the player is actually waiting for; hints and evaluation refreshes yield to them
+ENGINE_WAIT_DEADLINES = {
+    PRIORITY_MOVE: float(os.environ.get('ENGINE_MOVE_DEADLINE', 30)),
+    PRIORITY_HINT: float(os.environ.get('ENGINE_HINT_DEADLINE', 5)),
+    PRIORITY_EVAL: float(os.environ.get('ENGINE_EVAL_DEADLINE', 2)),
+    PRIORITY_ANALYSIS: float(os.environ.get('ENGINE_ANALYSIS_DEADLINE', 60)),
+    PRIORITY_PONDER: 0,
+}
+# Fraction of the normal search budget used for hints while every engine is busy
+app.config['DEGRADED_SEARCH_FACTOR'] = float(os.environ.get('DEGRADED_SEARCH_FACTOR', 0.25))
+
+def profile_for(difficulty):
+    return DIFFICULTY_PROFILES.get(difficulty, DIFFICULTY_PROFILES['Medium'])
+
+def degraded_profile(profile):
+    factor = app.config['DEGRADED_SEARCH_FACTOR']
+    return dict(profile,
+                movetime=profile['movetime'] * factor if profile['movetime'] else None,
+                depth=max(1, int(profile['depth'] * factor)) if profile['depth'] else None,
+                nodes=max(1, int(profile['nodes'] * factor)) if profile['nodes'] else None,
+                stable_depths=0)
+
+def search_limit(profile):
+    return chess.engine.Limit(time=profile['movetime'], depth=profile['depth'], nodes=profile['nodes'])
+
+# Run one search within the difficulty's budget; the result always carries score and PV in info
+def search(engine, board, profile, game=None, play=True):
+    if profile['stable_depths'] and profile['skill_level'] >= 20:
+        # Only at full strength: weaker Skill Levels choose their move when the search ends
+        with ENGINE_SEARCH_SECONDS.time(kind='stable'):
+            return play_until_stable(engine, board, search_limit(profile), profile['stable_depths'],
+                                     profile['min_depth'], game=game)
+    if play:
+        with ENGINE_SEARCH_SECONDS.time(kind='play'):
+            return play_with_lines(engine, board, search_limit(profile), game=game)
+    with ENGINE_SEARCH_SECONDS.time(kind='analyse'):
+        info = engine.analyse(board, search_limit(profile), game=game)
+    pv = info.get('pv', [])
+    return chess.engine.PlayResult(pv[0] if pv else None, pv[1] if len(pv) > 1 else None, info)
+
+# Position evaluations shared across games, optionally persisted to SQLite across restarts
+app.config['EVAL_CACHE_SIZE'] = int(os.environ.get('EVAL_CACHE_SIZE', 100000))
+app.config['EVAL_CACHE_TTL'] = int(os.environ.get('EVAL_CACHE_TTL', 86400))
+app.config['EVAL_CACHE_DB'] = os.environ.get('EVAL_CACHE_DB') or None
+eval_cache = EvalCache(max_entries=app.config['EVAL_CACHE_SIZE'], ttl=app.config['EVAL_CACHE_TTL'],
+                       db_path=app.config['EVAL_CACHE_DB'])
+atexit.register(eval_cache.close)
+
+# Optional local opening book and endgame tablebases, consulted before any engine search
+app.config['BOOK_PATH'] = os.environ.get('BOOK_PATH') or None
+app.config['BOOK_MAX_PLY'] = int(os.environ.get('BOOK_MAX_PLY', 30))
+app.config['SYZYGY_DIR'] = os.environ.get('SYZYGY_DIR') or None
+opening_book = OpeningBook(app.config['BOOK_PATH'], max_ply=app.config['BOOK_MAX_PLY']) if app.config['BOOK_PATH'] else None
+tablebase = Tablebase(app.config['SYZYGY_DIR']) if app.config['SYZYGY_DIR'] else None
+for move_source in (opening_book, tablebase):
+    if move_source is not None:
+        atexit.register(move_source.close)
+
+def book_or_tablebase_move(board, difficulty):
+    if tablebase is not None:
+        move = tablebase.move(board, difficulty)
+        if move is not None:
+            return move, 'tablebase'
+    if opening_book is not None:
+        move = opening_book.move(board, difficulty)
+        if move is not None:
+            return move, 'book'
+    return None, None
 
 # Flask-Login setup
 login_manager = LoginManager()
@@ -33,6 +195,39 @@ limiter = Limiter(
     default_limits=["200 per day", "50 per hour"]
 )
 
+# Request timing, plus an opt-in sampling profiler that logs where slow requests spent their time.
+# SLOW_REQUEST_PROFILE_MS=0 (the default) leaves the profiler off.
+app.config['SLOW_REQUEST_PROFILE_MS'] = float(os.environ.get('SLOW_REQUEST_PROFILE_MS', 0))
+app.config['SLOW_REQUEST_SAMPLE_MS'] = float(os.environ.get('SLOW_REQUEST_SAMPLE_MS', 5))
+profiler = (SlowRequestProfiler(app.config['SLOW_REQUEST_PROFILE_MS'] / 1000, app.config['SLOW_REQUEST_SAMPLE_MS'] / 1000)
+            if app.config['SLOW_REQUEST_PROFILE_MS'] > 0 else None)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+    if profiler is not None:
+        profiler.start()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.endpoint or 'unknown'
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint, method=request.method)
+        HTTP_REQUESTS.inc(endpoint=endpoint, method=request.method, status=str(response.status_code))
+    response.headers['X-Request-ID'] = g.get('request_id', '')
+    return response
+
+@app.teardown_request
+def stop_request_profiler(exception):
+    if profiler is None:
+        return
+    report = profiler.stop()
+    if report is not None:
+        SLOW_REQUESTS.inc(endpoint=request.endpoint or 'unknown')
+        app.logger.warning(f"Slow request {request.method} {request.path}: {report}")
+
 # User class for Flask-Login
 class User(UserMixin):
     def __init__(self, id, username):
@@ -47,23 +242,54 @@ def load_user(user_id):
         return User(user_data['id'], user_data['username'])
     return None
 
-# Database connection management
+# Database connection management. Each thread keeps one long-lived connection in WAL mode,
+# so readers never block the writer and requests skip the connect/close cost.
+app.config['DATABASE'] = os.environ.get('DATABASE', 'games.db')
+app.config['DB_BUSY_TIMEOUT_MS'] = int(os.environ.get('DB_BUSY_TIMEOUT_MS', 5000))
+db_local = threading.local()
+db_migrated = threading.Lock()
+db_schema_ready = False
+
+def connect_db(factory=sqlite3.Connection):
+    conn = sqlite3.connect(app.config['DATABASE'], timeout=app.config['DB_BUSY_TIMEOUT_MS'] / 1000,
+                           factory=factory)
+    conn.row_factory = sqlite3.Row
+    conn.execute(f"PRAGMA busy_timeout = {app.config['DB_BUSY_TIMEOUT_MS']}")
+    conn.execute("PRAGMA synchronous = NORMAL")  # Safe with WAL; skips an fsync per commit
+    conn.execute("PRAGMA cache_size = -8000")  # 8 MB page cache per connection
+    conn.execute("PRAGMA temp_store = MEMORY")
+    return conn
+
 def get_db():
+    global db_schema_ready
     if 'db' not in g:
-        g.db = sqlite3.connect('games.db')
-        g.db.row_factory = sqlite3.Row
+        if not db_schema_ready:
+            with db_migrated:
+                if not db_schema_ready:
+                    init_db()
+                    db_schema_ready = True
+        conn = getattr(db_local, 'conn', None)
+        if conn is None:
+            conn = db_local.conn = connect_db()
+        g.db = conn
     return g.db
 
 @app.teardown_appcontext
 def close_db(exception):
     db = g.pop('db', None)
-    if db is not None:
-        db.close()
+    if db is not None and db.in_transaction:
+        # The connection outlives the request, so never leave a transaction open on it
+        db.rollback()
 
-# Initialize SQLite database
-def init_db():
-    conn = sqlite3.connect('games.db')
-    c = conn.cursor()
+# Take the write lock up front: the wait for it is measured, and a transaction that starts
+# out reading can never fail with SQLITE_BUSY half-way through when it upgrades to a writer
+def begin_write(db, operation):
+    if not db.in_transaction:
+        with DB_LOCK_WAIT_SECONDS.time(operation=operation):
+            db.execute("BEGIN IMMEDIATE")
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version
+def migrate_initial_schema(c):
     # Users table
     c.execute('''CREATE TABLE IF NOT EXISTS users (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -81,6 +307,95 @@ def init_db():
         created_at TEXT NOT NULL,
         updated_at TEXT NOT NULL
     )''')
+
+def migrate_game_indexes(c):
+    # Per-user listings and "most recent game" lookups
+    c.execute("CREATE INDEX IF NOT EXISTS idx_games_user_updated ON games (user_id, updated_at)")
+    # Retention cleanup scans by age across all users
+    c.execute("CREATE INDEX IF NOT EXISTS idx_games_updated ON games (updated_at)")
+
+def migrate_move_log(c):
+    # One row per ply, appended as the game goes on, instead of rewriting a JSON list every move.
+    # games.fen becomes a checkpoint of the position at checkpoint_ply.
+    c.execute('''CREATE TABLE IF NOT EXISTS moves (
+        game_id INTEGER NOT NULL,
+        ply INTEGER NOT NULL,
+        move INTEGER NOT NULL,
+        PRIMARY KEY (game_id, ply)
+    ) WITHOUT ROWID''')
+    c.execute("ALTER TABLE games ADD COLUMN ply_count INTEGER NOT NULL DEFAULT 0")
+    c.execute("ALTER TABLE games ADD COLUMN checkpoint_ply INTEGER NOT NULL DEFAULT 0")
+    # Move existing JSON histories into the log; their FEN is the position after the last move
+    rows = c.execute("SELECT game_id, move_history FROM games WHERE move_history != '[]'").fetchall()
+    for game_id, move_history in rows:
+        moves = json.loads(move_history)
+        c.executemany("INSERT OR REPLACE INTO moves (game_id, ply, move) VALUES (?, ?, ?)",
+                      [(game_id, ply, encode_move(move)) for ply, move in enumerate(moves)])
+        c.execute("UPDATE games SET move_history = '[]', ply_count = ?, checkpoint_ply = ? WHERE game_id = ?",
+                  (len(moves), len(moves), game_id))
+
+def migrate_game_difficulty(c):
+    c.execute("ALTER TABLE games ADD COLUMN difficulty TEXT NOT NULL DEFAULT 'Medium'")
+
+def migrate_game_analysis(c):
+    # Finished post-game reviews, valid while the game still has ply_count plies
+    c.execute('''CREATE TABLE IF NOT EXISTS game_analysis (
+        game_id INTEGER PRIMARY KEY,
+        ply_count INTEGER NOT NULL,
+        depth INTEGER NOT NULL,
+        plies TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        created_at TEXT NOT NULL
+    )''')
+
+def migrate_game_listing(c):
+    # Listing summaries are stored whenever a game is written, so the game list never reads moves
+    c.execute("ALTER TABLE games ADD COLUMN result TEXT")
+    c.execute("ALTER TABLE games ADD COLUMN last_move TEXT")
+    rows = c.execute("SELECT game_id, fen, checkpoint_ply FROM games WHERE ply_count > 0").fetchall()
+    for game_id, fen, checkpoint_ply in rows:
+        moves = [decode_move(move) for move, in c.execute("SELECT move FROM moves WHERE game_id = ? ORDER BY ply", (game_id,))]
+        board = replay_moves(moves, fen, checkpoint_ply)
+        c.execute("UPDATE games SET result = ?, last_move = ? WHERE game_id = ?",
+                  (game_result(board), moves[-1] if moves else None, game_id))
+    # Pages of a user's games come straight out of this index, in (updated_at, game_id) order,
+    # without visiting the table; it also serves "most recent game" lookups
+    c.execute('''CREATE INDEX IF NOT EXISTS idx_games_user_listing
+                 ON games (user_id, updated_at, game_id, created_at, ply_count, result, last_move)''')
+    c.execute("DROP INDEX IF EXISTS idx_games_user_updated")
+
+def migrate_packed_moves(c):
+    # A row per ply cost a page of the moves table on top of the games row every write touches
+    # anyway; kept in the games row, the log adds two bytes to a page that is written regardless
+    c.execute("ALTER TABLE games ADD COLUMN packed_moves BLOB NOT NULL DEFAULT x''")
+    rows = c.connection.execute("SELECT game_id, move FROM moves ORDER BY game_id, ply")
+    for game_id, moves in itertools.groupby(rows, key=lambda row: row[0]):
+        values = [move for _, move in moves]
+        c.execute("UPDATE games SET packed_moves = ? WHERE game_id = ?",
+                  (struct.pack(f'<{len(values)}H', *values), game_id))
+    c.execute("DROP TABLE moves")
+
+MIGRATIONS = [
+    migrate_initial_schema,
+    migrate_game_indexes,
+    migrate_move_log,
+    migrate_game_difficulty,
+    migrate_game_analysis,
+    migrate_game_listing,
+    migrate_packed_moves,
+]
+
+# Initialize SQLite database
+def init_db():
+    conn = sqlite3.connect(app.config['DATABASE'], timeout=app.config['DB_BUSY_TIMEOUT_MS'] / 1000)
+    conn.execute("PRAGMA journal_mode = WAL")  # Persistent: stored in the database file
+    c = conn.cursor()
+    version = c.execute("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        migration(c)
+        c.execute(f"PRAGMA user_version = {number}")
+        conn.commit()
+        app.logger.info(f"Applied database migration {number}: {migration.__name__}")
     conn.commit()
     conn.close()
 
@@ -92,127 +407,257 @@ class GameState:
         self.player_color = "White"
         self.last_prob = None
         self.current_game_id = None
+        self.difficulty = 'Medium'
+        # Bookkeeping for the in-memory game store
+        self.user_id = None
+        self.dirty = False
+        self.updated_at = None
+        self.last_access = time.time()
+        self.lock = threading.RLock()
+        self.persisted_ply = 0
+        self.packed_moves = b''  # The packed log as last written or read, persisted_ply moves long
+        self.checkpoint_ply = 0
+        self.persisted_at = None  # updated_at of the games row as this process last wrote or read it
 
-    def get_engine(self):
-        if 'engine' not in g:
-            engine_path = "./stockfish.exe" if os.name == 'nt' else "./stockfish"
-            retries = 3
-            for attempt in range(retries):
-                try:
-                    g.engine = chess.engine.SimpleEngine.popen_uci(engine_path, timeout=10.0)
-                    app.logger.info(f"Stockfish initialized from {engine_path}")
-                    break
-                except Exception as e:
-                    app.logger.error(f"Failed to initialize Stockfish (attempt {attempt + 1}/{retries}): {e}")
-                    if attempt == retries - 1:
-                        g.engine = None
-                    else:
-                        import time
-                        time.sleep(1)  # Wait 1 second before retrying
-        return g.engine
+    @property
+    def profile(self):
+        return profile_for(self.difficulty)
+
+    def engine(self, priority=PRIORITY_MOVE):
+        # Check out a pooled engine configured for this game's difficulty
+        profile = self.profile
+        options = {"Skill Level": profile['skill_level'], "Hash": profile['hash'], "Threads": profile['threads']}
+        return engine_pool.checkout(options, timeout=ENGINE_WAIT_DEADLINES[priority], priority=priority)
 
     def set_difficulty(self, level):
-        engine = self.get_engine()
-        if engine is None:
-            app.logger.warning("Stockfish engine not available for setting difficulty")
-            return
-        skill_levels = {'Easy': 5, 'Medium': 10, 'Hard': 20}
-        try:
-            engine.configure({"Skill Level": skill_levels.get(level, 10)})
-            app.logger.info(f"Stockfish difficulty set to {level} (Skill Level: {skill_levels.get(level, 10)})")
-        except Exception as e:
-            app.logger.error(f"Failed to set Stockfish difficulty: {e}")
+        self.difficulty = level if level in DIFFICULTY_PROFILES else 'Medium'
+        app.logger.info(f"Stockfish difficulty set to {self.difficulty} (Skill Level: {self.profile['skill_level']})")
+
+    def analyse(self, board=None, priority=PRIORITY_HINT):
+        # Serve the evaluation from the shared cache when this position has been analysed before
+        board = self.board if board is None else board
+        if tablebase is not None:
+            wdl = tablebase.probe_wdl(board)
+            if wdl is not None:
+                move = tablebase.move(board, 'Hard')
+                cp = 0 if abs(wdl) < 2 else (TABLEBASE_WIN_CP if wdl > 0 else -TABLEBASE_WIN_CP)
+                return CachedEval(board.turn, cp, None, [move.uci()] if move else [], 0)
+        profile = self.profile
+        cached = eval_cache.get(board, min_depth=profile['min_depth'])
+        if cached is not None:
+            return cached
+        if engine_pool.saturated():
+            # Every engine is busy: settle for any earlier evaluation of this position, then for
+            # a shorter search, and skip evaluation refreshes altogether rather than queue them
+            cached = eval_cache.get(board, allow_stale=True)
+            if cached is not None or priority >= PRIORITY_EVAL:
+                return cached
+            profile = degraded_profile(profile)
+        with self.engine(priority) as engine:
+            result = search(engine, board, profile, game=self.current_game_id, play=False)
+        return eval_cache.put(board, result.info)
 
     def get_win_probability(self):
-        engine = self.get_engine()
-        if engine is None:
-            app.logger.warning("Stockfish engine not available for win probability calculation")
-            return 50
-        if self.last_prob is not None and not self.board.is_game_over():
+        if self.board.is_game_over():
+            outcome = self.board.outcome()
+            if outcome.winner is None:
+                return 50
+            return 100 if outcome.winner == (self.player_color == "White") else 0
+        if self.known_win_probability() is not None:
             return self.last_prob
         try:
-            info = engine.analyse(self.board, chess.engine.Limit(time=0.5))
-            score_obj = info.get("score", chess.engine.Cp(0)).relative
-            # Check if the score is a mate score
-            if isinstance(score_obj, chess.engine.Mate):
-                mate_value = score_obj.mate()  # Positive if winning, negative if losing
-                if self.player_color == "Black":
-                    mate_value = -mate_value
-                # If mate_value is positive, the player is winning (probability 100)
-                # If mate_value is negative, the player is losing (probability 0)
-                self.last_prob = 100 if mate_value > 0 else 0
-            else:
-                # Handle centipawn score
-                score = score_obj.score()
-                if score is None:
-                    app.logger.warning("Score is None, defaulting to 0")
-                    score = 0
-                if self.player_color == "Black":
-                    score = -score
-                self.last_prob = 50 + 50 * (score / (abs(score) + 200)) if score != 0 else 50
-            return max(0, min(100, self.last_prob))
+            analysis = self.analyse(priority=PRIORITY_EVAL)
+            if analysis is None:
+                return 50
+            self.last_prob = win_probability(analysis.score, self.player_color)
+            return self.last_prob
+        except EngineUnavailableError as e:
+            app.logger.warning(f"Stockfish engine not available for win probability calculation: {e}")
+            return 50
         except Exception as e:
             app.logger.error(f"Error in get_win_probability: {e}")
             return 50
 
-# Clean up Stockfish engine after each request
-@app.teardown_request
-def cleanup_engine(exception):
-    engine = g.pop('engine', None)
-    if engine is not None:
-        try:
-            engine.quit()
-            app.logger.info("Stockfish engine closed")
-        except Exception as e:
-            app.logger.error(f"Failed to close Stockfish engine: {e}")
+    def known_win_probability(self):
+        # What is already known without searching: the result, the last evaluation, or any
+        # cached evaluation of this position; None when nothing is known yet
+        if self.board.is_game_over():
+            return self.get_win_probability()
+        if self.last_prob is None:
+            cached = eval_cache.get(self.board, allow_stale=True)
+            if cached is not None:
+                self.last_prob = win_probability(cached.score, self.player_color)
+        return self.last_prob
+
+# Convert an engine score (from either side's point of view) into the player's win probability
+def win_probability(score, player_color):
+    pov = score.pov(chess.WHITE if player_color == "White" else chess.BLACK)
+    value = pov.score(mate_score=100000)
+    if pov.is_mate():
+        # A forced mate for the player is a certain win, a forced mate against them a certain loss
+        return 100 if value > 0 else 0
+    return max(0, min(100, 50 + 50 * (value / (abs(value) + 200))))
+
+# Clean up old games in small batches so writers are never locked out for long
+app.config['GAME_RETENTION_DAYS'] = int(os.environ.get('GAME_RETENTION_DAYS', 7))
+app.config['CLEANUP_INTERVAL'] = int(os.environ.get('CLEANUP_INTERVAL', 3600))
+app.config['CLEANUP_BATCH_SIZE'] = int(os.environ.get('CLEANUP_BATCH_SIZE', 500))
 
-# Clean up old games
+@DB_OPERATION_SECONDS.time(operation='cleanup')
 def cleanup_old_games():
     db = get_db()
-    threshold = (datetime.utcnow() - timedelta(days=7)).isoformat()
+    threshold = (datetime.utcnow() - timedelta(days=app.config['GAME_RETENTION_DAYS'])).isoformat()
+    deleted = 0
     try:
-        db.execute("DELETE FROM games WHERE updated_at < ?", (threshold,))
-        db.commit()
-        app.logger.info("Cleaned up old games")
+        while True:
+            begin_write(db, 'cleanup')
+            batch = [(row['game_id'],) for row in db.execute("SELECT game_id FROM games WHERE updated_at < ? LIMIT ?",
+                                                             (threshold, app.config['CLEANUP_BATCH_SIZE']))]
+            db.executemany("DELETE FROM game_analysis WHERE game_id = ?", batch)
+            db.executemany("DELETE FROM games WHERE game_id = ?", batch)
+            db.commit()
+            deleted += len(batch)
+            if len(batch) < app.config['CLEANUP_BATCH_SIZE']:
+                break
+            time.sleep(0.05)  # Let queued writers in between batches
+        db_log.info("Cleaned up %d old games", deleted)
     except Exception as e:
         app.logger.error(f"Failed to clean up old games: {e}")
+    return deleted
+
+def run_cleanup_loop(stop):
+    while not stop.wait(app.config['CLEANUP_INTERVAL']):
+        with app.app_context():
+            cleanup_old_games()
+
+cleanup_stop = threading.Event()
+threading.Thread(target=run_cleanup_loop, args=(cleanup_stop,), name='game-cleanup', daemon=True).start()
+atexit.register(cleanup_stop.set)
+
+# Moves are packed into 16 bits, from square (6 bits) | to square (6 bits) | promotion piece
+# type (3 bits), and a game's whole log is stored as one little-endian blob in its games row
+app.config['CHECKPOINT_INTERVAL'] = int(os.environ.get('CHECKPOINT_INTERVAL', 20))
+
+def encode_move(uci):
+    move = chess.Move.from_uci(uci)
+    return move.from_square | (move.to_square << 6) | ((move.promotion or 0) << 12)
+
+def decode_move(value):
+    return chess.Move(value & 0x3F, (value >> 6) & 0x3F, (value >> 12) or None).uci()
+
+def pack_moves(moves):
+    return struct.pack(f'<{len(moves)}H', *(encode_move(move) for move in moves))
+
+def unpack_moves(packed):
+    return [decode_move(value) for value in struct.unpack(f'<{len(packed) // 2}H', packed)]
+
+def game_result(board):
+    return board.result() if board.is_game_over() else None
+
+# Collect what has changed since the game was last written; call with the game's lock held
+def pending_write(game_state):
+    ply_count = len(game_state.move_history)
+    start = min(game_state.persisted_ply, ply_count)
+    # Only the plies after the last write are encoded; a takeback cuts the stored log short
+    packed_moves = game_state.packed_moves[:2 * start] + pack_moves(game_state.move_history[start:])
+    checkpoint = (ply_count - game_state.checkpoint_ply >= app.config['CHECKPOINT_INTERVAL']
+                  or ply_count < game_state.checkpoint_ply or game_state.board.is_game_over())
+    write = {
+        'game_id': game_state.current_game_id,
+        'meta': (ply_count, packed_moves, game_state.player_color, game_state.difficulty, game_state.last_prob,
+                 game_state.updated_at, game_result(game_state.board), game_state.move_history[-1] if ply_count else None,
+                 game_state.current_game_id),
+        'checkpoint': (game_state.board.fen(), ply_count, game_state.current_game_id) if checkpoint else None,
+        'previous': (game_state.persisted_ply, game_state.packed_moves, game_state.checkpoint_ply, game_state.persisted_at),
+    }
+    game_state.persisted_ply = ply_count
+    game_state.packed_moves = packed_moves
+    game_state.persisted_at = game_state.updated_at
+    if checkpoint:
+        game_state.checkpoint_ply = ply_count
+    return write
 
 # Save game state to database
+@DB_OPERATION_SECONDS.time(operation='save_game')
 def save_game_to_db(user_id, game_state):
     db = get_db()
     now = datetime.utcnow().isoformat()
-    move_history_json = json.dumps(game_state.move_history)
-    
+
     try:
-        if game_state.current_game_id is None:
-            db.execute('''INSERT INTO games (user_id, fen, move_history, player_color, probability, created_at, updated_at)
-                         VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                      (user_id, game_state.board.fen(), move_history_json, game_state.player_color, game_state.last_prob, now, now))
-            game_state.current_game_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
-        else:
-            db.execute('''UPDATE games SET fen = ?, move_history = ?, player_color = ?, probability = ?, updated_at = ?
-                         WHERE game_id = ?''',
-                      (game_state.board.fen(), move_history_json, game_state.player_color, game_state.last_prob, now, game_state.current_game_id))
-        db.commit()
-        app.logger.info(f"Saved game to database: game_id={game_state.current_game_id}, user_id={user_id}")
+        with game_state.lock:
+            if game_state.current_game_id is None:
+                begin_write(db, 'save_game')
+                db.execute('''INSERT INTO games (user_id, fen, move_history, player_color, difficulty, probability, created_at, updated_at, ply_count, checkpoint_ply)
+                             VALUES (?, ?, '[]', ?, ?, ?, ?, ?, 0, 0)''',
+                          (user_id, game_state.board.fen(), game_state.player_color, game_state.difficulty, game_state.last_prob, now, now))
+                game_state.current_game_id = db.execute("SELECT last_insert_rowid()").fetchone()[0]
+                game_state.persisted_ply = game_state.checkpoint_ply = 0
+            game_state.updated_at = now
+            write = pending_write(game_state)
+            game_state.dirty = False
+        write_games_to_db([write], db)
+        db_log.info("Saved game to database: game_id=%s, user_id=%s", game_state.current_game_id, user_id)
     except Exception as e:
         app.logger.error(f"Failed to save game to database: {e}")
         raise
     return game_state.current_game_id
 
+# Write the new plies and state of several games in one transaction (used by the write-behind flusher)
+@DB_OPERATION_SECONDS.time(operation='write_games')
+def write_games_to_db(writes, db=None):
+    db = db or get_db()
+    try:
+        begin_write(db, 'write_games')
+        db.executemany('''UPDATE games SET ply_count = ?, packed_moves = ?, player_color = ?, difficulty = ?, probability = ?,
+                          updated_at = ?, result = ?, last_move = ? WHERE game_id = ?''', [w['meta'] for w in writes])
+        db.executemany("UPDATE games SET fen = ?, checkpoint_ply = ? WHERE game_id = ?",
+                       [w['checkpoint'] for w in writes if w['checkpoint'] is not None])
+        db.commit()
+        db_log.info("Flushed %d games to database", len(writes))
+    except Exception as e:
+        db.rollback()
+        app.logger.error(f"Failed to flush games to database: {e}")
+        raise
+
+# Rebuild the board with its full move stack so repetition draws survive a reload.
+# If the log cannot be replayed, fall back to the last FEN checkpoint plus the plies after it.
+def replay_moves(move_history, fen, checkpoint_ply):
+    board = chess.Board()
+    try:
+        for move in move_history:
+            board.push_uci(move)
+        return board
+    except ValueError:
+        app.logger.warning(f"Move log does not replay, resuming from checkpoint at ply {checkpoint_ply}")
+    board = chess.Board(fen)
+    try:
+        for move in move_history[checkpoint_ply:]:
+            board.push_uci(move)
+    except ValueError:
+        app.logger.warning("Move log does not match checkpoint, loading checkpoint position only")
+        board = chess.Board(fen)
+    return board
+
 # Load game state from database
+@DB_OPERATION_SECONDS.time(operation='load_game')
 def load_game_from_db(game_id, user_id, game_state):
     db = get_db()
     try:
-        result = db.execute('''SELECT fen, move_history, player_color, probability FROM games
-                             WHERE game_id = ? AND user_id = ?''', (game_id, user_id)).fetchone()
+        result = db.execute('''SELECT fen, checkpoint_ply, player_color, difficulty, probability, updated_at, packed_moves
+                             FROM games WHERE game_id = ? AND user_id = ?''', (game_id, user_id)).fetchone()
         if result:
-            game_state.board = chess.Board(result['fen'])
-            game_state.move_history = json.loads(result['move_history'])
+            game_state.move_history = unpack_moves(result['packed_moves'])
+            game_state.board = replay_moves(game_state.move_history, result['fen'], result['checkpoint_ply'])
             game_state.player_color = result['player_color']
+            game_state.difficulty = result['difficulty']
             game_state.last_prob = result['probability']
             game_state.current_game_id = game_id
-            app.logger.info(f"Loaded game from database: game_id={game_id}, user_id={user_id}")
+            game_state.user_id = user_id
+            game_state.persisted_ply = len(game_state.move_history)
+            game_state.packed_moves = result['packed_moves']
+            game_state.checkpoint_ply = result['checkpoint_ply']
+            game_state.updated_at = game_state.persisted_at = result['updated_at']
+            db_log.info("Loaded game from database: game_id=%s, user_id=%s", game_id, user_id)
             return True
         app.logger.warning(f"Game not found in database: game_id={game_id}, user_id={user_id}")
         return False
@@ -224,54 +669,303 @@ def load_game_from_db(game_id, user_id, game_state):
 def load_most_recent_game(user_id, game_state):
     db = get_db()
     try:
-        result = db.execute('''SELECT game_id, fen, move_history, player_color, probability FROM games
+        result = db.execute('''SELECT game_id FROM games
                              WHERE user_id = ? ORDER BY updated_at DESC LIMIT 1''', (user_id,)).fetchone()
-        if result:
-            game_state.current_game_id = result['game_id']
-            game_state.board = chess.Board(result['fen'])
-            game_state.move_history = json.loads(result['move_history'])
-            game_state.player_color = result['player_color']
-            game_state.last_prob = result['probability']
-            app.logger.info(f"Loaded most recent game for user_id={user_id}: game_id={result['game_id']}")
+        if result and load_game_from_db(result['game_id'], user_id, game_state):
+            db_log.info("Loaded most recent game for user_id=%s: game_id=%s", user_id, result['game_id'])
             return True
-        app.logger.info(f"No recent games found for user_id={user_id}")
+        db_log.info("No recent games found for user_id=%s", user_id)
         return False
     except Exception as e:
         app.logger.error(f"Failed to load most recent game: {e}")
         return False
 
-# Get list of games for a user
-def get_user_games(user_id):
+# Game list pages are keyed on (updated_at, game_id) of the last game shown, so every page
+# costs the same however many games the user has
+def encode_game_cursor(row):
+    return f"{row['updated_at']}|{row['game_id']}"
+
+def decode_game_cursor(cursor):
+    updated_at, sep, game_id = str(cursor).rpartition('|')
+    if not sep or not game_id.isdigit():
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return updated_at, int(game_id)
+
+# Get one page of a user's games, most recently updated first, and the cursor of the next page
+@DB_OPERATION_SECONDS.time(operation='list_games')
+def get_user_games(user_id, limit=20, before=None):
     db = get_db()
     try:
-        games = db.execute('''SELECT game_id, created_at, updated_at FROM games
-                             WHERE user_id = ? ORDER BY updated_at DESC''', (user_id,)).fetchall()
-        result = [{'game_id': row['game_id'], 'created_at': row['created_at'], 'updated_at': row['updated_at']} for row in games]
-        app.logger.info(f"Retrieved {len(result)} games for user_id={user_id}")
-        return result
+        query = '''SELECT game_id, created_at, updated_at, ply_count, result, last_move FROM games
+                   WHERE user_id = ?'''
+        params = [user_id]
+        if before is not None:
+            query += " AND (updated_at, game_id) < (?, ?)"
+            params.extend(before)
+        query += " ORDER BY updated_at DESC, game_id DESC LIMIT ?"
+        rows = db.execute(query, params + [limit + 1]).fetchall()
+        result = [dict(row) for row in rows[:limit]]
+        db_log.info("Retrieved %d games for user_id=%s", len(result), user_id)
+        return result, encode_game_cursor(rows[limit - 1]) if len(rows) > limit else None
     except Exception as e:
         app.logger.error(f"Failed to retrieve user games: {e}")
-        return []
+        return [], None
+
+# In-memory store of live games. Hot games are served from here and written back to SQLite
+# by a background flusher instead of on every request.
+app.config['GAME_STORE_MAX_GAMES'] = int(os.environ.get('GAME_STORE_MAX_GAMES', 5000))
+app.config['GAME_STORE_MAX_PLIES'] = int(os.environ.get('GAME_STORE_MAX_PLIES', 500000))
+app.config['GAME_STORE_IDLE_TIMEOUT'] = int(os.environ.get('GAME_STORE_IDLE_TIMEOUT', 1800))
+app.config['GAME_STORE_FLUSH_INTERVAL'] = float(os.environ.get('GAME_STORE_FLUSH_INTERVAL', 2.0))
+# 'write-behind' batches dirty games every flush interval; 'write-through' writes on every change.
+# Finished games and explicit saves are always written immediately.
+app.config['GAME_STORE_DURABILITY'] = os.environ.get('GAME_STORE_DURABILITY', 'write-behind')
+
+class GameStore:
+    def __init__(self, max_games, max_plies, idle_timeout, flush_interval, durability):
+        self.max_games = max_games
+        self.max_plies = max_plies
+        self.idle_timeout = idle_timeout
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self._games = OrderedDict()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._flusher = None
+
+    # Games are keyed by their integer id; ids that arrive as strings (JSON, sessions) are converted
+    # so one game never ends up resident twice
+    def get(self, game_id, user_id):
+        game_id = int(game_id)
+        with self._lock:
+            game_state = self._games.get(game_id)
+            if game_state is not None:
+                self._games.move_to_end(game_id)
+        if game_state is not None and game_state.user_id == user_id and self._changed_elsewhere(game_state):
+            self._discard(game_state)
+            game_state = None
+        if game_state is None:
+            game_state = GameState()
+            if not load_game_from_db(game_id, user_id, game_state):
+                return None
+            with self._lock:
+                # Another request may have loaded the same game in the meantime
+                game_state = self._games.setdefault(game_id, game_state)
+            self._evict()
+        elif game_state.user_id != user_id:
+            return None
+        game_state.last_access = time.time()
+        return game_state
+
+    # A resident game is only served while its games row is the one this process last wrote or
+    # read; a newer row means another process has moved the game on (or it was deleted)
+    def _changed_elsewhere(self, game_state):
+        row = get_db().execute("SELECT ply_count, updated_at FROM games WHERE game_id = ?",
+                               (game_state.current_game_id,)).fetchone()
+        with game_state.lock:
+            if row is None:
+                return True
+            persisted_at = game_state.persisted_at or ''
+            return row['updated_at'] > persisted_at or (row['updated_at'] == persisted_at
+                                                         and row['ply_count'] != game_state.persisted_ply)
+
+    def _discard(self, game_state):
+        with self._lock:
+            if self._games.get(game_state.current_game_id) is game_state:
+                del self._games[game_state.current_game_id]
+        if game_state.dirty:
+            app.logger.warning(f"Dropping unsaved changes to game_id={game_state.current_game_id}: "
+                               "the stored game is newer")
+        db_log.info("Reloading game_id=%s, changed in the database", game_state.current_game_id)
+
+    def _holds(self, game_state):
+        with self._lock:
+            return self._games.get(game_state.current_game_id) is game_state
+
+    def peek(self, game_id, user_id):
+        # The game if it is already in memory; never loads it or counts as an access
+        game_id = int(game_id)
+        with self._lock:
+            game_state = self._games.get(game_id)
+        return game_state if game_state is not None and game_state.user_id == user_id else None
+
+    def add(self, game_state):
+        with self._lock:
+            self._games[game_state.current_game_id] = game_state
+        self._evict()
+
+    def mark_dirty(self, game_state):
+        with game_state.lock:
+            game_state.dirty = True
+            game_state.updated_at = datetime.utcnow().isoformat()
+        # The flusher only walks resident games, so a game evicted while a request still held it
+        # is written straight away
+        if (self.durability == 'write-through' or game_state.board.is_game_over()
+                or not self._holds(game_state)):
+            self.flush([game_state])
 
-# Store only the game_id in the session
+    def flush(self, game_states=None, blocking=True):
+        if game_states is None:
+            with self._lock:
+                game_states = list(self._games.values())
+        writes = []
+        flushed = []
+        for game_state in game_states:
+            # The background flusher skips games that are mid-move and picks them up next round
+            if not game_state.lock.acquire(blocking=blocking):
+                continue
+            try:
+                if not game_state.dirty:
+                    continue
+                writes.append(pending_write(game_state))
+                game_state.dirty = False
+                flushed.append(game_state)
+            finally:
+                game_state.lock.release()
+        if not writes:
+            return 0
+        try:
+            with app.app_context():
+                write_games_to_db(writes)
+        except Exception:
+            for game_state, write in zip(flushed, writes):
+                with game_state.lock:
+                    (game_state.persisted_ply, game_state.packed_moves, game_state.checkpoint_ply,
+                     game_state.persisted_at) = write['previous']
+                    game_state.dirty = True
+            raise
+        return len(writes)
+
+    def _evict(self):
+        now = time.time()
+        evicted = []
+        with self._lock:
+            plies = sum(len(game_state.move_history) for game_state in self._games.values())
+            for game_id, game_state in list(self._games.items()):
+                over_budget = len(self._games) > self.max_games or plies > self.max_plies
+                if not over_budget and now - game_state.last_access < self.idle_timeout:
+                    break
+                del self._games[game_id]
+                plies -= len(game_state.move_history)
+                evicted.append(game_state)
+        if evicted:
+            self.flush(evicted)
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush(blocking=False)
+                self._evict()
+            except Exception as e:
+                app.logger.error(f"Game store flush failed: {e}")
+
+    def start(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._run, name='game-store-flusher', daemon=True)
+            self._flusher.start()
+
+    def close(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception as e:
+            app.logger.error(f"Final game store flush failed: {e}")
+
+    def user_games(self, user_id):
+        with self._lock:
+            return [game_state for game_state in self._games.values() if game_state.user_id == user_id]
+
+    def stats(self):
+        with self._lock:
+            return {'games': len(self._games), 'dirty': sum(1 for game_state in self._games.values() if game_state.dirty)}
+
+game_store = GameStore(app.config['GAME_STORE_MAX_GAMES'], app.config['GAME_STORE_MAX_PLIES'],
+                       app.config['GAME_STORE_IDLE_TIMEOUT'], app.config['GAME_STORE_FLUSH_INTERVAL'],
+                       app.config['GAME_STORE_DURABILITY'])
+game_store.start()
+atexit.register(game_store.close)
+
+def current_user_key():
+    return str(current_user.id) if current_user.is_authenticated else "guest"
+
+# Store only the game_id in the session; the game itself lives in the game store
 def get_game_state():
-    if 'game_id' not in session:
+    user_id = current_user_key()
+    game_state = game_store.get(session['game_id'], user_id) if 'game_id' in session else None
+    if game_state is None:
         game_state = GameState()
-        user_id = str(current_user.id) if current_user.is_authenticated else "guest"
-        game_state.current_game_id = save_game_to_db(user_id, game_state)
-        session['game_id'] = game_state.current_game_id
-    else:
-        game_state = GameState()
-        user_id = str(current_user.id) if current_user.is_authenticated else "guest"
-        if not load_game_from_db(session['game_id'], user_id, game_state):
-            game_state = GameState()
-            game_state.current_game_id = save_game_to_db(user_id, game_state)
-            session['game_id'] = game_state.current_game_id
+        save_game_state(game_state)
+    g.game_id = game_state.current_game_id
     return game_state
 
 def save_game_state(game_state):
-    user_id = str(current_user.id) if current_user.is_authenticated else "guest"
-    session['game_id'] = save_game_to_db(user_id, game_state)
+    if game_state.current_game_id is None:
+        # New games get their row straight away so the id can go into the session
+        game_state.user_id = current_user_key()
+        save_game_to_db(game_state.user_id, game_state)
+        game_store.add(game_state)
+    else:
+        game_store.mark_dirty(game_state)
+    session['game_id'] = game_state.current_game_id
+    g.game_id = game_state.current_game_id
+
+# Static assets. The page's script (chessboard.js plus script.js, prefixed with the sound URLs
+# and with the piece images inlined as data URIs) and its stylesheet are minified, named by
+# content hash and precompressed once at startup, then served from memory with immutable cache
+# headers, ahead of the Flask app; templates link them through asset_url(). In debug mode a
+# changed source is rebuilt.
+# ASSET_URL_PREFIX may also be a CDN origin (https://cdn.example.com/assets) serving the output
+# of the build-assets command; this app then still answers on the prefix's path.
+app.config['ASSET_URL_PREFIX'] = os.environ.get('ASSET_URL_PREFIX', '/assets')
+PIECES = [color + piece for color in 'wb' for piece in 'KQRBNP']
+# Every file the bundle is built from: a directory's mtime only changes when entries are added
+# or removed, not when a file in it is edited
+ASSET_SOURCES = ('chessboard.js', 'script.js', 'style.css', 'move.wav', 'capture.wav', 'check.wav',
+                 *(f'img/chesspieces/wikipedia/{piece}.png' for piece in PIECES))
+
+def asset_sources_mtime():
+    return max(os.path.getmtime(os.path.join(app.static_folder, source)) for source in ASSET_SOURCES)
+
+def build_assets():
+    static = app.static_folder
+    def read(path, mode='r'):
+        with open(os.path.join(static, path), mode) as f:
+            return f.read()
+    pipeline = AssetPipeline(app.config['ASSET_URL_PREFIX'])
+    urls = {sound: pipeline.add(*audio_asset(sound, read(sound, 'rb')))
+            for sound in ('move.wav', 'capture.wav', 'check.wav')}
+    urls['pieces'] = {piece: data_uri(f'{piece}.png', read(f'img/chesspieces/wikipedia/{piece}.png', 'rb'))
+                      for piece in PIECES}
+    pipeline.add('app.js', minify_js(read('chessboard.js')) + f"window.ASSET_URLS={json.dumps(urls)};\n"
+                 + minify_js(read('script.js')))
+    pipeline.add('style.css', minify_css(read('style.css')))
+    stats = pipeline.stats()
+    app.logger.info(f"Built {stats['assets']} static assets: {stats['bytes']} bytes, {stats['gzip_bytes']} gzipped, "
+                    f"{stats['br_bytes']} with brotli where available")
+    return pipeline
+
+asset_state = {'pipeline': build_assets(), 'built_at': asset_sources_mtime()}
+
+def current_assets():
+    if app.debug:
+        mtime = asset_sources_mtime()
+        if mtime != asset_state['built_at']:
+            asset_state['pipeline'], asset_state['built_at'] = build_assets(), mtime
+    return asset_state['pipeline']
+
+@app.template_global()
+def asset_url(name):
+    return current_assets().url(name)
+
+app.wsgi_app = AssetMiddleware(app.wsgi_app, current_assets, urlsplit(app.config['ASSET_URL_PREFIX']).path)
+
+# Write the built assets and their .gz/.br variants out for a front-end server or CDN:
+# flask --app app build-assets static/dist
+@app.cli.command('build-assets')
+@click.argument('directory', type=click.Path(file_okay=False))
+def build_assets_command(directory):
+    build_assets().write(directory)
+    click.echo(f"Wrote static assets to {directory}", err=True)
 
 @app.route('/')
 @login_required
@@ -313,7 +1007,7 @@ def login():
 def logout():
     # Save the current game state before logging out
     game_state = get_game_state()
-    save_game_to_db(str(current_user.id), game_state)
+    game_store.flush([game_state])
     # Log the user ID before logging out
     app.logger.info(f"User logged out: user_id={current_user.id}")
     # Clear the session
@@ -347,154 +1041,529 @@ def register():
         app.logger.warning(f"Registration failed: Username already exists: {username}")
         return jsonify({'error': 'Username already exists'}), 400
 
+# Server push: /events/<game_id> streams a game's AI moves, evaluation updates and ready hints
+# as Server-Sent Events. A stream ends after EVENT_STREAM_SECONDS and the browser reconnects
+# with Last-Event-ID, so nothing is missed; beyond EVENT_STREAM_LIMIT open streams, new ones
+# are refused. Idle streams only wait on a condition, so under a gevent/eventlet worker they
+# cost a greenlet each rather than a thread.
+app.config['EVENT_STREAM_SECONDS'] = float(os.environ.get('EVENT_STREAM_SECONDS', 300))
+app.config['EVENT_STREAM_LIMIT'] = int(os.environ.get('EVENT_STREAM_LIMIT', 1000))
+app.config['EVENT_HEARTBEAT_SECONDS'] = float(os.environ.get('EVENT_HEARTBEAT_SECONDS', 15))
+app.config['LIVE_EVAL_ENABLED'] = os.environ.get('LIVE_EVAL_ENABLED', '1') == '1'
+game_events = GameEvents(max_listeners=app.config['EVENT_STREAM_LIMIT'])
+
+live_eval_executor = ThreadPoolExecutor(max_workers=app.config['ENGINE_POOL_SIZE'], thread_name_prefix='live-eval')
+
+def publish_eval(game_state, ply, score, depth):
+    game_events.publish(game_state.current_game_id, 'eval', {
+        'ply': ply,
+        'depth': depth,
+        'final': depth >= app.config['ANALYSIS_DEPTH'],
+        'score': score_json(score),
+        'probability': win_probability(score, game_state.player_color)
+    })
+
+# Push the evaluation of the position the player now faces straight from the cache (the tail of
+# the PV that chose the AI move, or the win probability lookup, has just filled it), then deepen
+# it on an engine nobody else wants while the player thinks
+def publish_live_eval(game_state, ply):
+    evaluation = eval_cache.get(game_state.board, allow_stale=True)
+    if evaluation is not None:
+        publish_eval(game_state, ply, evaluation.score, evaluation.depth)
+        if evaluation.best_move and get_ponder_hint(game_state) is None:  # Pondering pushed its hint already
+            game_events.publish(game_state.current_game_id, 'hint', {'ply': ply, 'hint': evaluation.best_move})
+    known_depth = evaluation.depth if evaluation is not None else 0
+    if known_depth < app.config['ANALYSIS_DEPTH'] and not engine_pool.saturated():
+        live_eval_executor.submit(run_live_eval, game_state, game_state.board.copy(), ply, known_depth)
+
+# Publishes each depth past ``known_depth`` as the engine reaches it. The checkout only takes an
+# idle engine, like pondering, and the search stops as soon as the game moves on.
+def run_live_eval(game_state, board, ply, known_depth):
+    game_id = game_state.current_game_id
+    limit = chess.engine.Limit(depth=app.config['ANALYSIS_DEPTH'])
+    try:
+        with engine_pool.checkout(ANALYSIS_OPTIONS, timeout=ENGINE_WAIT_DEADLINES[PRIORITY_PONDER],
+                                  priority=PRIORITY_PONDER) as engine:
+            if not hasattr(engine, 'analysis'):
+                # Engines behind the engine service only return the final result
+                info = engine.analyse(board, limit, game=game_id)
+            else:
+                with engine.analysis(board, limit, game=game_id) as analysis:
+                    for info in analysis:
+                        if len(game_state.move_history) != ply:
+                            return
+                        if 'score' in info and info.get('depth', 0) > known_depth and info.get('multipv', 1) == 1:
+                            known_depth = info['depth']
+                            publish_eval(game_state, ply, info['score'], known_depth)
+                    info = analysis.info
+    except EngineUnavailableError:
+        return
+    except Exception as e:
+        app.logger.warning(f"Live evaluation failed for game_id={game_id}: {e}")
+        return
+    entry = eval_cache.put(board, info)
+    if entry is None or len(game_state.move_history) != ply:
+        return
+    if entry.depth > known_depth:
+        publish_eval(game_state, ply, entry.score, entry.depth)
+    if entry.best_move:
+        game_events.publish(game_id, 'hint', {'ply': ply, 'hint': entry.best_move})
+
+# Pondering: while the human thinks, search the position after their predicted reply so a
+# ponderhit serves the next AI move (and the hint) without waiting for the engine
+app.config['PONDER_ENABLED'] = os.environ.get('PONDER_ENABLED', '1') == '1'
+ponder_executor = ThreadPoolExecutor(max_workers=app.config['ENGINE_POOL_SIZE'], thread_name_prefix='ponder')
+ponder_jobs = {}
+ponder_lock = threading.Lock()
+ponder_stats = {'started': 0, 'hits': 0, 'misses': 0}
+PONDER_RETENTION = 1800  # seconds before an untouched prediction is dropped
+
+def count_ponder(outcome):
+    with ponder_lock:
+        ponder_stats[outcome] += 1
+
+# Stops the job's search so the engine answers with the best move found so far. Called with
+# ponder_lock held; the search thread checks ``stopped`` once it has registered its analysis.
+def stop_ponder(job):
+    job['stopped'] = True
+    if job.get('analysis') is not None:
+        job['analysis'].stop()
+
+def run_ponder_job(game_state, board, job):
+    try:
+        # Only borrow an engine nobody else is waiting for; pondering must never delay real moves
+        with game_state.engine(PRIORITY_PONDER) as engine:
+            if not hasattr(engine, 'analysis'):
+                # Engines behind the engine service cannot be interrupted and run to the profile's limit
+                return search(engine, board, game_state.profile, game=game_state.current_game_id)
+            def register(analysis):
+                with ponder_lock:
+                    job['analysis'] = analysis
+                    if job['stopped']:
+                        analysis.stop()
+            return play_with_lines(engine, board, search_limit(game_state.profile),
+                                   game=game_state.current_game_id, started=register)
+    except EngineUnavailableError:
+        return None
+
+def start_pondering(game_state, result):
+    if not app.config['PONDER_ENABLED'] or result.ponder is None or game_state.board.is_game_over():
+        return
+    predicted = game_state.board.copy()
+    predicted.push(result.ponder)
+    if predicted.is_game_over():
+        return
+    ponder_game = GameState()
+    ponder_game.current_game_id = game_state.current_game_id
+    ponder_game.difficulty = game_state.difficulty
+    # The predicted reply is only worth showing as a hint when it comes from a full-strength search
+    hint = result.ponder.uci() if game_state.profile['skill_level'] >= 20 else None
+    now = time.time()
+    with ponder_lock:
+        for stale_id in [k for k, job in ponder_jobs.items() if now - job['started'] > PONDER_RETENTION]:
+            stop_ponder(ponder_jobs.pop(stale_id))
+        job = {
+            'hint_key': chess.polyglot.zobrist_hash(game_state.board),
+            'hint': hint,
+            'key': chess.polyglot.zobrist_hash(predicted),
+            'difficulty': game_state.difficulty,
+            'started': now,
+            'stopped': False
+        }
+        job['future'] = ponder_executor.submit(run_ponder_job, ponder_game, predicted, job)
+        previous = ponder_jobs.get(game_state.current_game_id)
+        if previous is not None:
+            stop_ponder(previous)
+        ponder_jobs[game_state.current_game_id] = job
+        ponder_stats['started'] += 1
+    if hint is not None:
+        game_events.publish(game_state.current_game_id, 'hint', {'ply': len(game_state.move_history), 'hint': hint})
+
+def take_ponder_result(game_state):
+    with ponder_lock:
+        job = ponder_jobs.pop(game_state.current_game_id, None)
+        if job is not None:
+            # The player has moved: whatever the ponder search has found by now is the reply
+            stop_ponder(job)
+    if job is None:
+        return None
+    if job['key'] != chess.polyglot.zobrist_hash(game_state.board) or job['difficulty'] != game_state.difficulty:
+        count_ponder('misses')
+        return None
+    try:
+        result = job['future'].result(timeout=1.0)
+    except Exception as e:
+        app.logger.warning(f"Discarding ponder result for game_id={game_state.current_game_id}: {e}")
+        result = None
+    if result is None or result.move is None:
+        count_ponder('misses')
+        return None
+    count_ponder('hits')
+    move_log.info("Ponderhit for game_id=%s", game_state.current_game_id)
+    return result
+
+def get_ponder_hint(game_state):
+    with ponder_lock:
+        job = ponder_jobs.get(game_state.current_game_id)
+    if job is not None and job['hint_key'] == chess.polyglot.zobrist_hash(game_state.board):
+        return job['hint']
+    return None
+
+# Play the engine's reply on the current board and persist it
+def play_ai_move(game_state, user_id):
+    fast_move, source = book_or_tablebase_move(game_state.board, game_state.difficulty)
+    result = chess.engine.PlayResult(fast_move, None) if fast_move is not None else take_ponder_result(game_state)
+    if fast_move is not None:
+        move_log.info("AI move from %s: %s", source, fast_move)
+    if result is None:
+        with game_state.engine() as engine:
+            result = search(engine, game_state.board, game_state.profile, game=game_state.current_game_id)
+    ai_move = result.move.uci()
+    eval_cache.put(game_state.board, result.info)
+    with game_state.lock:
+        game_state.board.push(result.move)
+        game_state.move_history.append(ai_move)
+        game_state.last_prob = None
+    # The search that chose the move already evaluated the position after it in the line that
+    # starts with it: the PV at full strength, one of the lines lower Skill Levels choose among
+    line = next((line for line in getattr(result, 'lines', None) or [result.info]
+                 if 'score' in line and line.get('pv') and line['pv'][0] == result.move), None)
+    if line is not None:
+        eval_cache.put(game_state.board, {'score': line['score'], 'pv': line['pv'][1:],
+                                          'depth': max(line.get('depth', 1) - 1, 0)})
+        game_state.last_prob = win_probability(line['score'], game_state.player_color)
+    move_log.info("AI moved: %s, turn=%s, FEN=%s", ai_move, 'White' if game_state.board.turn else 'Black',
+                  Lazy(game_state.board.fen))
+    ply = len(game_state.move_history)
+    game_over = game_state.board.is_game_over()
+    game_events.publish(game_state.current_game_id, 'move', {
+        'game_id': game_state.current_game_id,
+        'ply': ply,
+        'move': ai_move,
+        'fen': game_state.board.fen(),
+        'probability': game_state.last_prob,
+        'result': game_state.board.result() if game_over else None
+    })
+    game_store.mark_dirty(game_state)
+    start_pondering(game_state, result)
+    response = {
+        'fen': game_state.board.fen(),
+        'move': ai_move,
+        'probability': game_state.get_win_probability(),
+        'history': game_state.move_history,
+        'player_color': game_state.player_color,
+        'game_id': game_state.current_game_id
+    }
+    if app.config['LIVE_EVAL_ENABLED'] and not game_over and game_events.listening(game_state.current_game_id):
+        publish_live_eval(game_state, ply)
+    if game_state.board.is_game_over():
+        response['result'] = game_state.board.result()
+    return response
+
+# Take back the player's move at ply - 1 when the AI reply to it failed, so the game is left as
+# it was before the request and the same move can be sent again. A no-op once the AI has moved.
+def undo_player_move(game_state, ply, last_prob=None):
+    with game_state.lock:
+        if ply == 0 or len(game_state.move_history) != ply or not game_state.board.move_stack:
+            return False
+        game_state.board.pop()
+        move = game_state.move_history.pop()
+        game_state.last_prob = last_prob
+        if game_state.persisted_ply > len(game_state.move_history):
+            game_store.mark_dirty(game_state)  # The flusher already wrote it; the next write truncates it
+        move_log.info("Took back player move %s after the AI reply failed", move)
+        return True
+
+# Background AI replies: /move returns straight away and the client collects the reply from /move_result
+app.config['AI_WORKERS'] = int(os.environ.get('AI_WORKERS', app.config['ENGINE_POOL_SIZE']))
+ai_executor = ThreadPoolExecutor(max_workers=app.config['AI_WORKERS'], thread_name_prefix='ai-move')
+ai_jobs = {}
+ai_jobs_lock = threading.Lock()
+AI_JOB_RETENTION = 300  # seconds a finished reply stays collectable
+
+def run_ai_job(user_id, game_id, expected_ply, request_id=None):
+    with app.app_context():
+        g.game_id, g.request_id = game_id, request_id
+        game_state = game_store.get(game_id, user_id)
+        if game_state is None:
+            raise LookupError(f"Game {game_id} disappeared before the AI could move")
+        with game_state.lock:
+            if len(game_state.move_history) != expected_ply:
+                raise RuntimeError(f"Game {game_id} changed while the AI was thinking")
+        # The lock is not held during the search: player moves are refused with a 409 while this
+        # job is pending, and holding it would only park their request threads until it finishes
+        try:
+            return play_ai_move(game_state, user_id)
+        except Exception:
+            # Hand the turn back to the player rather than leave the AI to move with no job running
+            undo_player_move(game_state, expected_ply)
+            raise
+
+def submit_ai_move(game_state, user_id):
+    job_id = uuid.uuid4().hex
+    future = ai_executor.submit(run_ai_job, user_id, game_state.current_game_id, len(game_state.move_history),
+                                g.get('request_id'))
+    now = time.time()
+    with ai_jobs_lock:
+        for stale_id in [k for k, job in ai_jobs.items() if job['future'].done() and now - job['submitted'] > AI_JOB_RETENTION]:
+            del ai_jobs[stale_id]
+        ai_jobs[job_id] = {'future': future, 'user_id': user_id, 'game_id': game_state.current_game_id, 'submitted': now}
+    move_log.info("Queued AI move: job_id=%s, game_id=%s", job_id, game_state.current_game_id)
+    return {
+        'fen': game_state.board.fen(),
+        'move': None,
+        'pending': True,
+        'job_id': job_id,
+        'probability': game_state.last_prob if game_state.last_prob is not None else 50,
+        'history': game_state.move_history,
+        'player_color': game_state.player_color,
+        'game_id': game_state.current_game_id
+    }
+
+# Block until a job's reply is ready; raises what the job raised
+def ai_job_result(job_id):
+    with ai_jobs_lock:
+        future = ai_jobs[job_id]['future']
+    return future.result()
+
+def pending_ai_job(game_id):
+    with ai_jobs_lock:
+        return next((job_id for job_id, job in ai_jobs.items()
+                     if job['game_id'] == game_id and not job['future'].done()), None)
+
+def ai_move_pending(game_id):
+    return pending_ai_job(game_id) is not None
+
+def ai_to_move(game_state):
+    return not game_state.board.is_game_over() and game_state.board.turn != (game_state.player_color == 'White')
+
+# The job computing the AI's reply when the AI is to move: the one already running, or a new one
+# when none is (its first move failed, or the process restarted while it was thinking)
+def ai_reply_job(game_state, user_id):
+    with game_state.lock:
+        if not ai_to_move(game_state):
+            return None
+        return pending_ai_job(game_state.current_game_id) or submit_ai_move(game_state, user_id)['job_id']
+
 @app.route('/move', methods=['POST'])
 @login_required
 @limiter.limit("20 per minute")
 def make_move():
     game_state = get_game_state()
-    engine = game_state.get_engine()
-    if engine is None:
-        app.logger.error("Stockfish engine not available for move")
-        return jsonify({'error': 'Stockfish not available'}), 500
     data = request.json
     move = data.get('move')
     user_id = str(current_user.id)
+    retryable = move == 'reset'  # Resending is only safe once the player's move has been taken back
     try:
         if move == 'reset':
-            game_state.board = chess.Board()
-            game_state.move_history = []
-            game_state.last_prob = None
+            game_state = GameState()
             difficulty = data.get('difficulty', 'Medium')
             game_state.player_color = data.get('player_color', 'White')
             game_state.set_difficulty(difficulty)
-            game_state.current_game_id = None
-            app.logger.info(f"Reset: player_color={game_state.player_color}, turn={'White' if game_state.board.turn else 'Black'}, FEN={game_state.board.fen()}")
+            move_log.info("Reset: player_color=%s, turn=%s, FEN=%s", game_state.player_color,
+                          'White' if game_state.board.turn else 'Black', Lazy(game_state.board.fen))
             if game_state.player_color == "Black":
-                result = engine.play(game_state.board, chess.engine.Limit(time=0.5))
-                ai_move = result.move.uci()
-                game_state.board.push(result.move)
-                game_state.move_history.append(ai_move)
-                app.logger.info(f"AI (White) moved: {ai_move}, turn={'White' if game_state.board.turn else 'Black'}, FEN={game_state.board.fen()}")
-                save_game_to_db(user_id, game_state)
                 save_game_state(game_state)
-                cleanup_old_games()
-                return jsonify({
-                    'fen': game_state.board.fen(),
-                    'move': ai_move,
-                    'probability': game_state.get_win_probability(),
-                    'history': game_state.move_history,
-                    'player_color': game_state.player_color,
-                    'game_id': game_state.current_game_id
-                })
-            save_game_to_db(user_id, game_state)
+                reply = submit_ai_move(game_state, user_id)
+                if data.get('async'):
+                    return jsonify(history_delta(reply, data))
+                return jsonify(history_delta(ai_job_result(reply['job_id']), data))
             save_game_state(game_state)
-            cleanup_old_games()
-            return jsonify({
+            return jsonify(history_delta({
                 'fen': game_state.board.fen(),
                 'move': None,
                 'probability': game_state.get_win_probability(),
                 'history': game_state.move_history,
                 'player_color': game_state.player_color,
                 'game_id': game_state.current_game_id
-            })
-        game_state.board.push_uci(move)
-        game_state.move_history.append(move)
-        game_state.last_prob = None
-        app.logger.info(f"Player moved: {move}, turn={'White' if game_state.board.turn else 'Black'}, FEN={game_state.board.fen()}")
-        if game_state.board.is_game_over():
-            save_game_to_db(user_id, game_state)
+            }, data))
+        with game_state.lock:
+            if ai_move_pending(game_state.current_game_id):
+                return jsonify({'error': 'AI is still thinking'}), 409
+            if ai_to_move(game_state):
+                return jsonify({'error': 'Not your turn'}), 409
+            game_state.board.push_uci(move)
+            game_state.move_history.append(move)
+            player_ply = len(game_state.move_history)
+            game_state.last_prob = None
+            move_log.info("Player moved: %s, turn=%s, FEN=%s", move, 'White' if game_state.board.turn else 'Black',
+                          Lazy(game_state.board.fen))
+            if game_state.board.is_game_over():
+                save_game_state(game_state)
+                return jsonify(history_delta({
+                    'fen': game_state.board.fen(),
+                    'move': None,
+                    'result': game_state.board.result(),
+                    'probability': game_state.get_win_probability(),
+                    'history': game_state.move_history,
+                    'player_color': game_state.player_color,
+                    'game_id': game_state.current_game_id
+                }, data))
             save_game_state(game_state)
-            cleanup_old_games()
-            return jsonify({
-                'fen': game_state.board.fen(),
-                'move': None,
-                'result': game_state.board.result(),
-                'probability': game_state.get_win_probability(),
-                'history': game_state.move_history,
-                'player_color': game_state.player_color,
-                'game_id': game_state.current_game_id
-            })
-        result = engine.play(game_state.board, chess.engine.Limit(time=0.5))
-        ai_move = result.move.uci()
-        game_state.board.push(result.move)
-        game_state.move_history.append(ai_move)
-        app.logger.info(f"AI moved: {ai_move}, turn={'White' if game_state.board.turn else 'Black'}, FEN={game_state.board.fen()}")
-        save_game_to_db(user_id, game_state)
-        save_game_state(game_state)
-        cleanup_old_games()
-        response = {
-            'fen': game_state.board.fen(),
-            'move': ai_move,
-            'probability': game_state.get_win_probability(),
-            'history': game_state.move_history,
-            'player_color': game_state.player_color,
-            'game_id': game_state.current_game_id
-        }
-        if game_state.board.is_game_over():
-            response['result'] = game_state.board.result()
-        return jsonify(response)
+            reply = submit_ai_move(game_state, user_id)
+            if data.get('async'):
+                return jsonify(history_delta(reply, data))
+        # Without async the reply is waited for here, but outside the game's lock, as /move_result does
+        try:
+            response = ai_job_result(reply['job_id'])
+        except Exception:
+            retryable = len(game_state.move_history) < player_ply  # The job took the player's move back
+            raise
+        return jsonify(history_delta(response, data))
     except ValueError:
         app.logger.warning(f"Invalid move attempted: {move}")
         return jsonify({'error': 'Invalid move'}), 400
+    except EngineBusyError as e:
+        app.logger.warning(f"Stockfish busy, move shed: {e}")
+        return jsonify({'error': 'Server busy, try again'}), 503, {'Retry-After': '1'} if retryable else {}
+    except EngineUnavailableError as e:
+        app.logger.error(f"Stockfish engine not available for move: {e}")
+        return jsonify({'error': 'Stockfish not available'}), 500
     except Exception as e:
         app.logger.error(f"Error in make_move: {e}")
         return jsonify({'error': 'Server error'}), 500
 
+@app.route('/move_result/<job_id>', methods=['GET'])
+@login_required
+@limiter.limit("60 per minute")
+def move_result(job_id):
+    with ai_jobs_lock:
+        job = ai_jobs.get(job_id)
+    if job is None or job['user_id'] != str(current_user.id):
+        return jsonify({'error': 'Unknown job'}), 404
+    wait = min(max(request.args.get('wait', 10, type=float), 0), 25)
+    try:
+        response = job['future'].result(timeout=wait)
+    except FutureTimeoutError:
+        return jsonify({'pending': True, 'job_id': job_id}), 202
+    except EngineBusyError as e:
+        app.logger.warning(f"Stockfish busy, move shed: {e}")
+        return jsonify({'error': 'Server busy, try again'}), 503, {'Retry-After': '1'}
+    except EngineUnavailableError as e:
+        app.logger.error(f"Stockfish engine not available for move: {e}")
+        return jsonify({'error': 'Stockfish not available'}), 500
+    except Exception as e:
+        app.logger.error(f"Error in AI move job {job_id}: {e}")
+        return jsonify({'error': 'Server error'}), 500
+    return jsonify(history_delta(response, request.args))
+
+# What a client sees of a game only changes with a new ply, or when the current ply's win
+# probability becomes known, so that is all the ETag encodes
+def game_tag(game_id, ply_count, settled):
+    return f"{game_id}-{ply_count}" + ('' if settled else '-pending')
+
+def game_state_tag(game_state):
+    settled = game_state.last_prob is not None or game_state.board.is_game_over()
+    return game_tag(game_state.current_game_id, len(game_state.move_history), settled)
+
+# The session game's tag without loading the game: from the game store when it is resident,
+# otherwise from its games row (the move log is not read)
+def session_game_tag():
+    if 'game_id' not in session:
+        return None
+    game_state = game_store.peek(session['game_id'], current_user_key())
+    if game_state is not None:
+        with game_state.lock:
+            if ai_to_move(game_state) and not ai_move_pending(game_state.current_game_id):
+                return None  # The full response restarts the AI's reply
+            return game_state_tag(game_state)
+    row = get_db().execute('''SELECT ply_count, probability, player_color, result FROM games
+                              WHERE game_id = ? AND user_id = ?''', (session['game_id'], current_user_key())).fetchone()
+    if row is None or (row['result'] is None and (row['ply_count'] % 2 == 0) == (row['player_color'] == 'Black')):
+        return None
+    return game_tag(session['game_id'], row['ply_count'], row['probability'] is not None)
+
+# Send only the plies after since_ply when the client says it has the first since_ply plies of
+# this game (it passes the game_id it holds); otherwise the full history goes out as before
+def history_delta(body, params):
+    try:
+        since_ply, game_id = int(params.get('since_ply')), int(params.get('game_id'))
+    except (TypeError, ValueError):
+        return body
+    history = body.get('history')
+    if history is None or game_id != body.get('game_id') or not 0 <= since_ply <= len(history):
+        return body
+    body = dict(body, since_ply=since_ply, ply_count=len(history), moves=history[since_ply:])
+    del body['history']
+    return body
+
 @app.route('/fen', methods=['GET'])
 @login_required
 def get_fen():
-    game_state = get_game_state()
-    return jsonify({
-        'fen': game_state.board.fen(),
-        'probability': game_state.get_win_probability(),
-        'history': game_state.move_history,
-        'player_color': game_state.player_color,
-        'game_id': game_state.current_game_id
-    })
+    tag = session_game_tag()
+    if tag is not None and request.if_none_match.contains_weak(tag):
+        response = Response(status=304)
+    else:
+        game_state = get_game_state()
+        with game_state.lock:
+            probability = game_state.known_win_probability()
+            body = {
+                'fen': game_state.board.fen(),
+                'probability': probability if probability is not None else 50,
+                'history': list(game_state.move_history),
+                'player_color': game_state.player_color,
+                'game_id': game_state.current_game_id
+            }
+            tag = game_state_tag(game_state)
+        job_id = ai_reply_job(game_state, current_user_key())
+        if job_id is not None:
+            body.update(pending=True, job_id=job_id)
+        response = jsonify(history_delta(body, request.args))
+    response.set_etag(tag, weak=True)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+# The engine's best move in ``board``, or None when the search gave no usable result (no score
+# or no principal variation) or was skipped
+def analysed_best_move(game_state, board=None):
+    analysis = game_state.analyse(board)
+    return analysis.best_move if analysis is not None else None
+
+def hint_unavailable():
+    hint_log.warning("No hint available for game_id=%s", g.get('game_id'))
+    return jsonify({'error': 'Hint unavailable, try again'}), 503, {'Retry-After': '1'}
 
 @app.route('/hint', methods=['GET'])
 @login_required
 @limiter.limit("20 per minute")
 def get_hint():
     game_state = get_game_state()
-    engine = game_state.get_engine()
-    if engine is None:
-        app.logger.error("Stockfish engine not available for hint")
-        return jsonify({'error': 'Stockfish not available'}), 500
     try:
         if game_state.board.is_game_over():
             return jsonify({'hint': None, 'message': 'Game is over'})
 
-        app.logger.info(f"Hint requested: player_color={game_state.player_color}, turn={'White' if game_state.board.turn else 'Black'}, FEN={game_state.board.fen()}")
+        hint_log.info("Hint requested: player_color=%s, turn=%s, FEN=%s", game_state.player_color,
+                      'White' if game_state.board.turn else 'Black', Lazy(game_state.board.fen))
 
-        if game_state.player_color == "White":
-            if game_state.board.turn == chess.WHITE:
-                result = engine.play(game_state.board, chess.engine.Limit(time=0.5))
-                hint = result.move.uci()
-                app.logger.info(f"Hint for White (direct): {hint}")
-                return jsonify({'hint': hint})
-            else:
-                temp_board = game_state.board.copy()
-                black_move = engine.play(temp_board, chess.engine.Limit(time=0.5)).move
-                temp_board.push(black_move)
-                result = engine.play(temp_board, chess.engine.Limit(time=0.5))
-                hint = result.move.uci()
-                app.logger.info(f"Simulated Black move: {black_move.uci()}, hint for White: {hint}")
-                return jsonify({'hint': hint})
-        elif game_state.player_color == "Black":
-            if game_state.board.turn == chess.BLACK:
-                result = engine.play(game_state.board, chess.engine.Limit(time=0.5))
-                hint = result.move.uci()
-                app.logger.info(f"Hint for Black (direct): {hint}")
-                return jsonify({'hint': hint})
-            else:
-                temp_board = game_state.board.copy()
-                white_move = engine.play(temp_board, chess.engine.Limit(time=0.5)).move
-                temp_board.push(white_move)
-                result = engine.play(temp_board, chess.engine.Limit(time=0.5))
-                hint = result.move.uci()
-                app.logger.info(f"Simulated White move: {white_move.uci()}, hint for Black: {hint}")
-                return jsonify({'hint': hint})
+        player_turn = chess.WHITE if game_state.player_color == "White" else chess.BLACK
+        if game_state.board.turn == player_turn:
+            fast_move, _ = book_or_tablebase_move(game_state.board, 'Hard')
+            hint = fast_move.uci() if fast_move else get_ponder_hint(game_state) or analysed_best_move(game_state)
+            if hint is None:
+                return hint_unavailable()
+            hint_log.info("Hint for %s (direct): %s", game_state.player_color, hint)
+            return jsonify({'hint': hint})
+        temp_board = game_state.board.copy()
+        fast_move, _ = book_or_tablebase_move(temp_board, game_state.difficulty)
+        opponent_move = fast_move.uci() if fast_move else analysed_best_move(game_state, temp_board)
+        if opponent_move is None:
+            return hint_unavailable()
+        temp_board.push_uci(opponent_move)
+        if temp_board.is_game_over():
+            return jsonify({'hint': None, 'message': 'Game is over'})
+        fast_move, _ = book_or_tablebase_move(temp_board, 'Hard')
+        hint = fast_move.uci() if fast_move else analysed_best_move(game_state, temp_board)
+        if hint is None:
+            return hint_unavailable()
+        hint_log.info("Simulated %s move: %s, hint for %s: %s", 'Black' if player_turn == chess.WHITE else 'White',
+                      opponent_move, game_state.player_color, hint)
+        return jsonify({'hint': hint})
+    except EngineBusyError as e:
+        app.logger.warning(f"Stockfish busy, hint shed: {e}")
+        return jsonify({'error': 'Server busy, try again'}), 503, {'Retry-After': '1'}
+    except EngineUnavailableError as e:
+        app.logger.error(f"Stockfish engine not available for hint: {e}")
+        return jsonify({'error': 'Stockfish not available'}), 500
     except Exception as e:
         app.logger.error(f"Error in get_hint: {e}")
         return jsonify({'error': 'Server error'}), 500
@@ -503,51 +1572,460 @@ def get_hint():
 @login_required
 def save_game_endpoint():
     game_state = get_game_state()
-    user_id = str(current_user.id)
-    game_id = save_game_to_db(user_id, game_state)
-    save_game_state(game_state)
-    cleanup_old_games()
-    return jsonify({'game_id': game_id})
+    game_store.mark_dirty(game_state)
+    game_store.flush([game_state])
+    session['game_id'] = game_state.current_game_id
+    return jsonify({'game_id': game_state.current_game_id})
 
 @app.route('/resume_game', methods=['POST'])
 @login_required
 def resume_game():
-    game_state = get_game_state()
     data = request.json
-    game_id = data.get('game_id')
+    try:
+        game_id = int(data.get('game_id'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid game_id'}), 400
     user_id = str(current_user.id)
-    if load_game_from_db(game_id, user_id, game_state):
-        save_game_state(game_state)
-        return jsonify({
+    game_state = game_store.get(game_id, user_id)
+    if game_state is not None:
+        session['game_id'] = g.game_id = game_state.current_game_id
+        body = {
             'fen': game_state.board.fen(),
             'history': game_state.move_history,
             'player_color': game_state.player_color,
             'probability': game_state.get_win_probability(),
             'game_id': game_state.current_game_id
-        })
+        }
+        job_id = ai_reply_job(game_state, user_id)
+        if job_id is not None:
+            body.update(pending=True, job_id=job_id)
+        return jsonify(history_delta(body, data))
     return jsonify({'error': 'Game not found'}), 404
 
+app.config['GAME_LIST_PAGE_SIZE'] = int(os.environ.get('GAME_LIST_PAGE_SIZE', 20))
+
 @app.route('/user_games', methods=['POST'])
 @login_required
 def user_games():
     user_id = str(current_user.id)
-    games = get_user_games(user_id)
-    return jsonify({'games': games})
+    data = request.get_json(silent=True) or {}
+    try:
+        limit = min(max(int(data.get('limit', app.config['GAME_LIST_PAGE_SIZE'])), 1), 100)
+        before = decode_game_cursor(data['cursor']) if data.get('cursor') else None
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Invalid limit or cursor'}), 400
+    # Write back this user's pending moves first so the listing's updated_at ordering is current
+    game_store.flush(game_store.user_games(user_id))
+    games, next_cursor = get_user_games(user_id, limit, before)
+    return jsonify({'games': games, 'next_cursor': next_cursor})
+
+# Bulk PGN export and import. An export is one pass over a single cursor of games, each row
+# carrying its packed moves, yielding each game's PGN as soon as its row is read; an import commits
+# every PGN_IMPORT_BATCH games. Memory stays flat however many games go through.
+app.config['PGN_IMPORT_BATCH'] = int(os.environ.get('PGN_IMPORT_BATCH', 500))
+PGN_GAMES = REGISTRY.counter('chess_pgn_games_total', 'Games exported or imported as PGN', ['direction'])
+
+def pgn_headers(row):
+    player = row['username'] or row['user_id']
+    engine = f"Stockfish ({row['difficulty']})"
+    white, black = (player, engine) if row['player_color'] == 'White' else (engine, player)
+    return {'Event': 'Chess vs AI', 'Site': '?', 'Date': row['created_at'][:10].replace('-', '.'), 'Round': '-',
+            'White': white, 'Black': black, 'Result': row['result'] or '*',
+            'GameId': str(row['game_id']), 'Difficulty': row['difficulty']}
+
+def game_to_pgn(row, moves):
+    try:
+        return game_pgn(pgn_headers(row), moves)
+    except ValueError as e:
+        app.logger.warning(f"Game does not replay, left out of export: game_id={row['game_id']}: {e}")
+        return ''
+
+# Yields PGN text one game at a time: a user's games, oldest activity first, or every game.
+# Both orders follow an index (idx_games_user_listing, or the games rowid), so SQLite never sorts.
+def export_games_pgn(db, user_id=None):
+    query = '''SELECT g.game_id, g.user_id, u.username, g.player_color, g.difficulty, g.created_at, g.result, g.packed_moves
+               FROM games g LEFT JOIN users u ON u.id = g.user_id'''
+    if user_id is None:
+        rows = db.execute(query + " ORDER BY g.game_id")
+    else:
+        rows = db.execute(query + " WHERE g.user_id = ? ORDER BY g.updated_at, g.game_id", (user_id,))
+    started = time.perf_counter()
+    exported = 0
+    for row in rows:
+        yield game_to_pgn(row, unpack_moves(row['packed_moves']))
+        exported += 1
+    elapsed = time.perf_counter() - started
+    PGN_GAMES.inc(exported, direction='export')
+    db_log.info("Exported %d games as PGN in %.1fs (%.0f games/s), user_id=%s",
+                exported, elapsed, exported / elapsed if elapsed else 0, user_id)
+
+# Stores every game of a PGN stream that replays from the standard position, PGN_IMPORT_BATCH
+# games per transaction. The user plays the side whose name matches theirs, White otherwise.
+@DB_OPERATION_SECONDS.time(operation='import_pgn')
+def import_games_pgn(db, handle, user_id, username=None):
+    started = time.perf_counter()
+    imported = skipped = plies = 0
+    batch = []
+
+    def write_batch():
+        now = datetime.utcnow().isoformat()
+        try:
+            begin_write(db, 'import_pgn')
+            for headers, moves, board in batch:
+                player_color = 'Black' if username and headers.get('Black') == username else 'White'
+                difficulty = headers.get('Difficulty')
+                if difficulty not in DIFFICULTY_PROFILES:
+                    difficulty = 'Medium'
+                result = game_result(board) or (headers.get('Result') if headers.get('Result') != '*' else None)
+                db.execute('''INSERT INTO games (user_id, fen, move_history, player_color, difficulty, probability,
+                              created_at, updated_at, ply_count, checkpoint_ply, result, last_move, packed_moves)
+                              VALUES (?, ?, '[]', ?, ?, NULL, ?, ?, ?, ?, ?, ?, ?)''',
+                           (user_id, board.fen(), player_color, difficulty, now, now, len(moves), len(moves),
+                            result, moves[-1].uci() if moves else None, pack_moves([move.uci() for move in moves])))
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            app.logger.error(f"Failed to import PGN batch: {e}")
+            raise
+        batch.clear()
+
+    for headers, moves, board, error in read_games(handle):
+        if error is not None or board is None:
+            skipped += 1
+            continue
+        batch.append((headers, moves, board))
+        imported += 1
+        plies += len(moves)
+        if len(batch) >= app.config['PGN_IMPORT_BATCH']:
+            write_batch()
+    if batch:
+        write_batch()
+    elapsed = time.perf_counter() - started
+    PGN_GAMES.inc(imported, direction='import')
+    db_log.info("Imported %d games (%d plies, %d skipped) from PGN in %.1fs, user_id=%s",
+                imported, plies, skipped, elapsed, user_id)
+    return {'imported': imported, 'skipped': skipped, 'plies': plies, 'seconds': round(elapsed, 3),
+            'games_per_second': round(imported / elapsed, 1) if elapsed else None}
+
+@app.route('/export.pgn', methods=['GET'])
+@login_required
+@limiter.limit("10 per minute")
+def export_pgn():
+    user_id = str(current_user.id)
+    game_store.flush(game_store.user_games(user_id))
+    filename = f"chess-vs-ai-{current_user.username}.pgn"
+    def chunks(size=65536):
+        # Many games per write rather than one small write each
+        buffered, length = [], 0
+        for pgn in export_games_pgn(get_db(), user_id):
+            buffered.append(pgn)
+            length += len(pgn)
+            if length >= size:
+                yield ''.join(buffered)
+                buffered, length = [], 0
+        yield ''.join(buffered)
+    return Response(stream_with_context(chunks()), mimetype='application/x-chess-pgn',
+                    headers={'Content-Disposition': f'attachment; filename="{filename}"', 'Cache-Control': 'no-store'})
+
+@app.route('/import_pgn', methods=['POST'])
+@login_required
+@limiter.limit("5 per minute")
+def import_pgn():
+    # A multipart upload (field "pgn") is spooled to disk by Werkzeug; a raw body is read as it arrives
+    upload = request.files.get('pgn')
+    stream = upload.stream if upload is not None else request.stream
+    handle = io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace')
+    try:
+        report = import_games_pgn(get_db(), handle, str(current_user.id), current_user.username)
+    except Exception:
+        return jsonify({'error': 'Import failed'}), 500
+    finally:
+        handle.detach()
+    return jsonify(report)
+
+# Admin-wide dump and bulk load: flask --app app export-pgn [--user ID] > games.pgn
+@app.cli.command('export-pgn')
+@click.option('--user', 'user_id', default=None, help='Only this user id (default: every game)')
+def export_pgn_command(user_id):
+    for pgn in export_games_pgn(get_db(), user_id):
+        click.echo(pgn, nl=False)
+
+@app.cli.command('import-pgn')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--user', 'user_id', required=True, help='User id that owns the imported games')
+def import_pgn_command(path, user_id):
+    row = get_db().execute("SELECT username FROM users WHERE id = ?", (user_id,)).fetchone()
+    with open(path, encoding='utf-8-sig', errors='replace') as handle:
+        report = import_games_pgn(get_db(), handle, user_id, row['username'] if row else None)
+    click.echo(json.dumps(report), err=True)
+
+# Post-game review: every position of a game is evaluated at a fixed depth, spread over the
+# engine pool, and each move is scored against the position before it. Repeated positions are
+# searched once, and positions already in the evaluation cache not at all.
+app.config['ANALYSIS_DEPTH'] = int(os.environ.get('ANALYSIS_DEPTH', 14))
+app.config['ANALYSIS_WORKERS'] = int(os.environ.get('ANALYSIS_WORKERS', app.config['ENGINE_POOL_SIZE']))
+analysis_executor = ThreadPoolExecutor(max_workers=app.config['ANALYSIS_WORKERS'], thread_name_prefix='analysis')
+ANALYSIS_OPTIONS = {"Skill Level": 20, "Hash": DIFFICULTY_PROFILES['Hard']['hash'], "Threads": 1}
+
+def evaluate_position(board, depth, game_id):
+    final = terminal_eval(board)
+    if final is not None:
+        return final
+    cached = eval_cache.get(board, min_depth=depth)
+    if cached is not None:
+        return cached
+    with engine_pool.checkout(ANALYSIS_OPTIONS, timeout=ENGINE_WAIT_DEADLINES[PRIORITY_ANALYSIS],
+                              priority=PRIORITY_ANALYSIS) as engine:
+        with ENGINE_SEARCH_SECONDS.time(kind='analysis'):
+            info = engine.analyse(board, chess.engine.Limit(depth=depth), game=game_id)
+    return eval_cache.put(board, info)
+
+def load_game_analysis(game_id, ply_count, depth):
+    row = get_db().execute("SELECT ply_count, depth, plies, summary FROM game_analysis WHERE game_id = ?",
+                           (game_id,)).fetchone()
+    if row is None or row['ply_count'] != ply_count or row['depth'] < depth:
+        return None
+    return row['depth'], json.loads(row['plies']), json.loads(row['summary'])
+
+@DB_OPERATION_SECONDS.time(operation='save_analysis')
+def save_game_analysis(game_id, depth, plies, summary):
+    db = get_db()
+    try:
+        begin_write(db, 'save_analysis')
+        db.execute("INSERT OR REPLACE INTO game_analysis (game_id, ply_count, depth, plies, summary, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+                   (game_id, len(plies), depth, json.dumps(plies), json.dumps(summary), datetime.utcnow().isoformat()))
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        app.logger.error(f"Failed to save analysis for game_id={game_id}: {e}")
+
+# Yields the review as it is produced: a header, one line per ply in order, then the summary
+def review_game(game_id, moves, depth):
+    board = chess.Board()
+    positions = [board.copy()]
+    try:
+        for move in moves:
+            board.push_uci(move)
+            positions.append(board.copy())
+    except ValueError:
+        yield {'error': 'Game cannot be replayed'}
+        return
+    evaluations = {}
+    keys = [chess.polyglot.zobrist_hash(position) for position in positions]
+    for key, position in zip(keys, positions):
+        if key not in evaluations:
+            evaluations[key] = analysis_executor.submit(evaluate_position, position, depth, game_id)
+    yield {'game_id': game_id, 'plies': len(moves), 'positions': len(evaluations), 'depth': depth, 'stored': False}
+    plies = []
+    try:
+        for ply, move in enumerate(moves):
+            entry = review_move(positions[ply], chess.Move.from_uci(move), evaluations[keys[ply]].result(),
+                                evaluations[keys[ply + 1]].result())
+            plies.append(entry)
+            yield entry
+    except EngineBusyError as e:
+        app.logger.warning(f"Stockfish busy, analysis of game_id={game_id} shed: {e}")
+        yield {'error': 'Server busy, try again'}
+        return
+    except EngineUnavailableError as e:
+        app.logger.error(f"Stockfish engine not available for analysis: {e}")
+        yield {'error': 'Stockfish not available'}
+        return
+    except Exception as e:
+        app.logger.error(f"Error analysing game_id={game_id}: {e}")
+        yield {'error': 'Server error'}
+        return
+    finally:
+        # Also reached when the client goes away mid-stream: drop the searches nobody will read
+        for future in evaluations.values():
+            future.cancel()
+    summary = summarize(plies)
+    save_game_analysis(game_id, depth, plies, summary)
+    app.logger.info(f"Analysed game_id={game_id}: {len(moves)} plies, {len(evaluations)} positions")
+    yield {'done': True, 'summary': summary}
+
+def replay_game_review(game_id, depth, plies, summary):
+    yield {'game_id': game_id, 'plies': len(plies), 'positions': None, 'depth': depth, 'stored': True}
+    yield from plies
+    yield {'done': True, 'summary': summary}
+
+@app.route('/analysis/<int:game_id>', methods=['GET'])
+@login_required
+@limiter.limit("10 per minute")
+def game_analysis(game_id):
+    game_state = game_store.get(game_id, str(current_user.id))
+    if game_state is None:
+        return jsonify({'error': 'Game not found'}), 404
+    g.game_id = game_id
+    with game_state.lock:
+        moves = list(game_state.move_history)
+    depth = app.config['ANALYSIS_DEPTH']
+    stored = load_game_analysis(game_id, len(moves), depth)
+    events = replay_game_review(game_id, *stored) if stored else review_game(game_id, moves, depth)
+    # NDJSON by default; Server-Sent Events for EventSource clients
+    sse = request.args.get('format') == 'sse' or 'text/event-stream' in request.headers.get('Accept', '')
+    def encode():
+        for event in events:
+            yield f"data: {json.dumps(event)}\n\n" if sse else json.dumps(event) + "\n"
+    return Response(stream_with_context(encode()), mimetype='text/event-stream' if sse else 'application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/events/<int:game_id>', methods=['GET'])
+@login_required
+@limiter.exempt
+def game_event_stream(game_id):
+    if game_store.get(game_id, current_user_key()) is None:
+        return jsonify({'error': 'Game not found'}), 404
+    latest = game_events.subscribe(game_id)
+    if latest is None:
+        return jsonify({'error': 'Too many event streams'}), 503, {'Retry-After': '10'}
+    # An id from before a restart or from another worker is no use here: start from the latest
+    last_seen = game_events.sequence(request.headers.get('Last-Event-ID'))
+    heartbeat = app.config['EVENT_HEARTBEAT_SECONDS']
+    deadline = time.monotonic() + app.config['EVENT_STREAM_SECONDS']
+    def stream():
+        after = latest if last_seen is None else last_seen
+        yield "retry: 2000\n\n"
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            events = game_events.wait(game_id, after, min(heartbeat, remaining))
+            if not events:
+                yield ": keepalive\n\n"
+            for seq, event, data in events:
+                yield f"id: {game_events.event_id(seq)}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+                after = seq
+    response = Response(stream(), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    # Runs even when the client goes away before the stream starts
+    response.call_on_close(lambda: game_events.unsubscribe(game_id))
+    return response
+
+# Point-in-time stats from the pool, caches and stores, copied into gauges on every scrape
+ENGINE_POOL_ENGINES = REGISTRY.gauge('chess_engine_pool_engines', 'Engines in the pool', ['state'])
+ENGINE_POOL_UTILIZATION = REGISTRY.gauge('chess_engine_pool_utilization', 'Fraction of the pool checked out')
+ENGINE_QUEUE_DEPTH = REGISTRY.gauge('chess_engine_queue_depth', 'Checkouts waiting for an engine', ['priority'])
+ENGINE_CHECKOUTS = REGISTRY.counter('chess_engine_checkouts_total', 'Engine checkouts by outcome', ['priority', 'outcome'])
+ENGINE_SPAWNS = REGISTRY.counter('chess_engine_spawns_total', 'Engine processes started')
+ENGINE_REPLACED = REGISTRY.counter('chess_engine_replaced_total', 'Engines discarded after crashing or hanging')
+EVAL_CACHE_ENTRIES = REGISTRY.gauge('chess_eval_cache_entries', 'Positions in the evaluation cache')
+EVAL_CACHE_LOOKUPS = REGISTRY.counter('chess_eval_cache_lookups_total', 'Evaluation cache lookups', ['result'])
+EVAL_CACHE_HIT_RATIO = REGISTRY.gauge('chess_eval_cache_hit_ratio', 'Evaluation cache hit ratio')
+MOVE_SOURCE_LOOKUPS = REGISTRY.counter('chess_move_source_lookups_total', 'Opening book and tablebase lookups',
+                                       ['source', 'result'])
+PONDER_RESULTS = REGISTRY.counter('chess_ponder_total', 'Ponder searches by outcome', ['result'])
+GAME_STORE_GAMES = REGISTRY.gauge('chess_game_store_games', 'Games held in memory', ['state'])
+AI_JOBS_PENDING = REGISTRY.gauge('chess_ai_jobs_pending', 'Background AI moves not yet finished')
+EVENT_STREAMS = REGISTRY.gauge('chess_event_streams', 'Open server-push streams')
+EVENTS_PUBLISHED = REGISTRY.counter('chess_events_published_total', 'Events published to server-push streams')
+LOG_RECORDS_DROPPED = REGISTRY.counter('chess_log_records_dropped_total', 'Log records dropped because the log queue was full')
+
+def collect_metrics():
+    pool = engine_pool.stats()
+    ENGINE_POOL_ENGINES.set(pool['in_use'], state='in_use')
+    ENGINE_POOL_ENGINES.set(pool['idle'], state='idle')
+    ENGINE_POOL_ENGINES.set(pool['size'], state='max')
+    ENGINE_POOL_UTILIZATION.set(pool['in_use'] / pool['size'] if pool['size'] else 0.0)
+    for priority, queue in pool['queue'].items():
+        ENGINE_QUEUE_DEPTH.set(queue['queued'], priority=priority)
+        for outcome in ('served', 'timeouts', 'shed'):
+            ENGINE_CHECKOUTS.set_total(queue[outcome], priority=priority, outcome=outcome)
+    ENGINE_SPAWNS.set_total(pool['spawned'])
+    ENGINE_REPLACED.set_total(pool['respawned'])
+    cache = eval_cache.stats()
+    EVAL_CACHE_ENTRIES.set(cache['entries'])
+    EVAL_CACHE_LOOKUPS.set_total(cache['hits'], result='hit')
+    EVAL_CACHE_LOOKUPS.set_total(cache['misses'], result='miss')
+    EVAL_CACHE_HIT_RATIO.set(cache['hit_rate'])
+    for name, source in (('book', opening_book), ('tablebase', tablebase)):
+        if source is not None:
+            for result, count in source.stats.as_dict().items():
+                MOVE_SOURCE_LOOKUPS.set_total(count, source=name, result=result)
+    with ponder_lock:
+        ponder_counts = dict(ponder_stats)
+    for result, count in ponder_counts.items():
+        PONDER_RESULTS.set_total(count, result=result)
+    store = game_store.stats()
+    GAME_STORE_GAMES.set(store['games'], state='loaded')
+    GAME_STORE_GAMES.set(store['dirty'], state='dirty')
+    with ai_jobs_lock:
+        AI_JOBS_PENDING.set(sum(1 for job in ai_jobs.values() if not job['future'].done()))
+    events = game_events.stats()
+    EVENT_STREAMS.set(events['listeners'])
+    EVENTS_PUBLISHED.set_total(events['published'])
+    LOG_RECORDS_DROPPED.set_total(log_handler.dropped)
+
+REGISTRY.add_collector(collect_metrics)
+
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def metrics():
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+# Health checks. Liveness only says the process is serving requests. Readiness checks that an
+# idle pooled engine answers isready and that the database is reachable. Its result is cached
+# for HEALTH_CHECK_TTL seconds, so frequent probes cost nothing. The deep check plays a real
+# search on a pooled engine and only runs on demand (/health?deep=1).
+app.config['HEALTH_CHECK_TTL'] = float(os.environ.get('HEALTH_CHECK_TTL', 5))
+readiness_lock = threading.Lock()
+readiness_cache = {'result': None, 'checked_at': 0.0}
+
+def check_database():
+    try:
+        get_db().execute("SELECT 1 FROM games LIMIT 1").fetchall()
+        return True, 'ok'
+    except sqlite3.Error as e:
+        return False, str(e)
+
+def check_readiness():
+    with readiness_lock:
+        now = time.monotonic()
+        if readiness_cache['result'] is not None and now - readiness_cache['checked_at'] < app.config['HEALTH_CHECK_TTL']:
+            return readiness_cache['result'], True
+        checks = {}
+        for name, check in (('engine', engine_pool.ping), ('database', check_database)):
+            started = time.perf_counter()
+            ok, detail = check()
+            checks[name] = {'ok': ok, 'detail': detail, 'ms': round((time.perf_counter() - started) * 1000, 2)}
+        result = {'status': 'ready' if all(check['ok'] for check in checks.values()) else 'unavailable',
+                  'checks': checks, 'checked_at': datetime.utcnow().isoformat()}
+        if result['status'] != 'ready':
+            app.logger.warning(f"Readiness check failed: {checks}")
+        readiness_cache.update(result=result, checked_at=now)
+        return result, False
+
+@app.route('/livez', methods=['GET'])
+@limiter.exempt
+def liveness():
+    return jsonify({'status': 'alive'})
+
+@app.route('/readyz', methods=['GET'])
+@limiter.exempt
+def readiness():
+    result, cached = check_readiness()
+    return jsonify(dict(result, cached=cached)), 200 if result['status'] == 'ready' else 503
 
 @app.route('/health', methods=['GET'])
+@limiter.limit("30 per minute", exempt_when=lambda: request.args.get('deep') != '1')
 def health():
+    if request.args.get('deep') != '1':
+        return readiness()
     try:
-        engine = chess.engine.SimpleEngine.popen_uci("./stockfish.exe" if os.name == 'nt' else "./stockfish", timeout=10.0)
-        engine.configure({"Skill Level": 10})
         board = chess.Board("rnbqkbnr/pppppppp/5n2/8/8/5N2/PPPPPPPP/RNBQKBNR w KQkq - 0 1")
-        result = engine.play(board, chess.engine.Limit(time=0.5))
-        engine.quit()
+        with engine_pool.checkout({"Skill Level": 10}, timeout=ENGINE_WAIT_DEADLINES[PRIORITY_EVAL],
+                                  priority=PRIORITY_EVAL) as engine:
+            result = engine.play(board, chess.engine.Limit(time=0.5))
+        database_ok, database_detail = check_database()
+        if not database_ok:
+            raise RuntimeError(f"Database check failed: {database_detail}")
         app.logger.info("Health check passed")
-        return jsonify({'status': 'healthy', 'best_move': result.move.uci()})
+        return jsonify({'status': 'healthy', 'best_move': result.move.uci(), 'engine_pool': engine_pool.stats()})
     except Exception as e:
         app.logger.error(f"Health check failed: {e}")
         return jsonify({'status': 'unhealthy', 'error': str(e)}), 500
 
 if __name__ == '__main__':
     init_db()
+    db_schema_ready = True
     app.run(host='0.0.0.0', port=5000, debug=True)
\ No newline at end of file
@@ -0,0 +1,247 @@
+import base64
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+
+from werkzeug.wrappers import Request, Response
+
+try:
+    import brotli
+except ImportError:  # Optional: without it only gzip variants are built
+    brotli = None
+
+# Hashed URLs never change content, so browsers may keep them for a year without revalidating
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# Types worth precompressing; images and audio are compressed formats already
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# Preferred order when the client accepts several encodings equally
+ENCODINGS = ('br', 'gzip', 'identity')
+
+_WORD = re.compile(r'[\w$]')
+_REGEX_KEYWORDS = re.compile(r'(?:^|[^\w$])(?:return|typeof|case|do|else|in|of|void|yield|delete|throw)$')
+
+
+def minify_js(source):
+    """Strip comments and redundant whitespace from JavaScript. Strings, template literals and
+    regular expression literals pass through untouched, and line breaks are kept wherever
+    automatic semicolon insertion could depend on them. A leading licence comment is kept."""
+    header = re.match(r'(?:[ \t]*//[^\n]*\n)+', source)
+    keep = header.group(0) if header and re.search(r'licen[cs]e', header.group(0), re.I) else ''
+    out = []
+    i, n = 0, len(source)
+
+    def last():
+        for chunk in reversed(out):
+            stripped = chunk.rstrip()
+            if stripped:
+                return stripped
+        return ''
+
+    while i < n:
+        c = source[i]
+        if c in '\'"`':
+            j = i + 1
+            while j < n and source[j] != c:
+                j += 2 if source[j] == '\\' else 1
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif source.startswith('//', i):
+            j = source.find('\n', i)
+            i = n if j < 0 else j
+        elif source.startswith('/*', i):
+            j = source.find('*/', i + 2)
+            j = n if j < 0 else j + 2
+            out.append('\n' if '\n' in source[i:j] else ' ')
+            i = j
+        elif c == '/' and (not last() or last()[-1] in '(,=:[!&|?{};+-*%<>~^' or _REGEX_KEYWORDS.search(last())):
+            j, in_class = i + 1, False
+            while j < n and source[j] != '\n' and (source[j] != '/' or in_class):
+                if source[j] == '\\':
+                    j += 1
+                elif source[j] in '[]':
+                    in_class = source[j] == '['
+                j += 1
+            out.append(source[i:j + 1])
+            i = j + 1
+        elif c.isspace():
+            j = i
+            while j < n and source[j].isspace():
+                j += 1
+            out.append('\n' if '\n' in source[i:j] else ' ')
+            i = j
+        else:
+            j = i + 1
+            while j < n and source[j] not in '\'"`/' and not source[j].isspace():
+                j += 1
+            out.append(source[i:j])
+            i = j
+
+    # Decide each whitespace run from its neighbours: a space survives only between two word
+    # characters (or '+ +', '- -'); a line break only where the statement might end there
+    result = []
+    k = 0
+    while k < len(out):
+        if out[k] not in (' ', '\n'):
+            result.append(out[k])
+            k += 1
+            continue
+        run = k
+        while k < len(out) and out[k] in (' ', '\n'):
+            k += 1
+        before = result[-1][-1] if result else ''
+        after = out[k][0] if k < len(out) else ''
+        if not before or not after:
+            continue
+        if '\n' in out[run:k] and before not in ';{,' and after != '}':
+            result.append('\n')
+        elif (_WORD.match(before) and _WORD.match(after)) or before + after in ('++', '--', '+-', '-+', '//'):
+            result.append(' ')
+    return keep + ''.join(result) + '\n'
+
+
+def minify_css(source):
+    """Strip comments and collapse whitespace in a stylesheet. Spaces before a colon are left
+    alone, since ``a :hover`` and ``a:hover`` are different selectors."""
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    source = re.sub(r'\s*([{};])\s*', r'\1', source)
+    source = re.sub(r'([:,]) ', r'\1', source)
+    return source.replace(';}', '}').strip() + '\n'
+
+
+def audio_asset(name, data):
+    """Name and bytes to serve for a sound file. MP3 data saved under another extension goes
+    out as .mp3 (so it gets the right content type) without its ID3v2 tag."""
+    stem = posixpath.splitext(name)[0]
+    if data[:3] == b'ID3' and len(data) > 10:
+        size = (data[6] << 21) | (data[7] << 14) | (data[8] << 7) | data[9]
+        return stem + '.mp3', data[10 + size + (10 if data[5] & 0x10 else 0):]
+    if data[:2] in (b'\xff\xfb', b'\xff\xf3', b'\xff\xf2'):
+        return stem + '.mp3', data
+    return name, data
+
+
+def data_uri(name, data):
+    content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+    return f"data:{content_type};base64,{base64.b64encode(data).decode('ascii')}"
+
+
+class Asset:
+    __slots__ = ('name', 'url', 'content_type', 'etag', 'variants')
+
+    def __init__(self, name, url, content_type, etag, variants):
+        self.name = name
+        self.url = url
+        self.content_type = content_type
+        self.etag = etag
+        self.variants = variants
+
+
+# Built assets, held in memory under content-hashed names. Each is compressed once, when it is
+# added; requests then only pick the variant the client accepts.
+class AssetPipeline:
+    def __init__(self, url_prefix='/assets'):
+        self.url_prefix = url_prefix.rstrip('/')
+        self._assets = {}
+        self._urls = {}
+
+    def add(self, name, data, content_type=None):
+        """Register ``data`` as the current version of ``name``; returns its hashed URL."""
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        content_type = content_type or mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type == 'application/javascript':
+            content_type += '; charset=utf-8'
+        digest = hashlib.sha256(data).hexdigest()
+        stem, ext = posixpath.splitext(name)
+        hashed = f"{stem}.{digest[:12]}{ext}"
+        variants = {'identity': data}
+        if content_type.startswith(COMPRESSIBLE_TYPES):
+            compressed = gzip.compress(data, compresslevel=9, mtime=0)
+            if len(compressed) < len(data):
+                variants['gzip'] = compressed
+            if brotli is not None:
+                compressed = brotli.compress(data, quality=11)
+                if len(compressed) < len(data):
+                    variants['br'] = compressed
+        url = f"{self.url_prefix}/{hashed}"
+        self._assets[hashed] = Asset(hashed, url, content_type, digest[:32], variants)
+        self._urls[name] = url
+        return url
+
+    def add_file(self, path, name=None):
+        with open(path, 'rb') as f:
+            return self.add(name or os.path.basename(path), f.read())
+
+    def url(self, name):
+        return self._urls.get(name)
+
+    def get(self, hashed_name):
+        return self._assets.get(hashed_name)
+
+    def negotiate(self, asset, accept_encodings):
+        """The best ``(encoding, body)`` of ``asset`` for a werkzeug Accept-Encoding header."""
+        def preference(encoding):
+            quality = accept_encodings.quality(encoding)
+            if encoding == 'identity' and encoding not in accept_encodings:
+                quality = 0.001  # Always acceptable unless refused outright
+            return quality, -ENCODINGS.index(encoding)
+        best = max((encoding for encoding in ENCODINGS if encoding in asset.variants), key=preference)
+        return best, asset.variants[best]
+
+    def response(self, name, request):
+        """The response to a request for hashed asset ``name``, or None if there is no such asset."""
+        asset = self._assets.get(name)
+        if asset is None:
+            return None
+        encoding, body = self.negotiate(asset, request.accept_encodings)
+        response = Response(body, content_type=asset.content_type)
+        if encoding != 'identity':
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        response.set_etag(f"{asset.etag}-{encoding}")
+        # Media elements fetch sounds with Range requests
+        return response.make_conditional(request, accept_ranges=True, complete_length=len(body))
+
+    def write(self, directory):
+        """Write every asset and its compressed variants (``.gz``/``.br``) to ``directory``,
+        for a front-end server or CDN to serve directly."""
+        os.makedirs(directory, exist_ok=True)
+        suffixes = {'identity': '', 'gzip': '.gz', 'br': '.br'}
+        for asset in self._assets.values():
+            for encoding, body in asset.variants.items():
+                with open(os.path.join(directory, asset.name + suffixes[encoding]), 'wb') as f:
+                    f.write(body)
+
+    def stats(self):
+        return {
+            'assets': len(self._assets),
+            'bytes': sum(len(a.variants['identity']) for a in self._assets.values()),
+            'gzip_bytes': sum(len(a.variants.get('gzip', a.variants['identity'])) for a in self._assets.values()),
+            'br_bytes': sum(len(a.variants.get('br', a.variants.get('gzip', a.variants['identity'])))
+                            for a in self._assets.values()),
+        }
+
+
+# Answers asset requests in front of the Flask app, so they skip sessions, login and rate limiting
+# (a session touched on the way out would add "Vary: Cookie" and keep shared caches from storing
+# them). ``pipeline`` is a callable returning the current AssetPipeline.
+class AssetMiddleware:
+    def __init__(self, wsgi_app, pipeline, path_prefix):
+        self.wsgi_app = wsgi_app
+        self.pipeline = pipeline
+        self.path_prefix = path_prefix.rstrip('/') + '/'
+
+    def __call__(self, environ, start_response):
+        path = environ.get('PATH_INFO', '')
+        if not path.startswith(self.path_prefix) or environ['REQUEST_METHOD'] not in ('GET', 'HEAD'):
+            return self.wsgi_app(environ, start_response)
+        request = Request(environ)
+        response = self.pipeline().response(path[len(self.path_prefix):], request)
+        if response is None:
+            response = Response('Not found', status=404, content_type='text/plain')
+        return response(environ, start_response)
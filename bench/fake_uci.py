@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""Deterministic stand-in for Stockfish that speaks just enough UCI for the app.
+
+Every search takes a fixed wall-clock time, so benchmark numbers measure the
+app rather than the engine. It picks a legal move seeded by the FEN, so the
+same position always gets the same move and score. Point the app at it with
+``STOCKFISH_PATH=bench/fake_uci.py``. Tune it with environment variables:
+
+    FAKE_UCI_LATENCY_MS  time one search takes, capped by ``go movetime`` (default 50)
+    FAKE_UCI_DEPTH       deepest ``info depth`` line reported (default 12)
+
+``go infinite`` and ``go ponder`` run until ``stop`` or ``ponderhit``, as a
+real engine does.
+"""
+import os
+import random
+import sys
+import threading
+import time
+
+import chess
+
+LATENCY = float(os.environ.get('FAKE_UCI_LATENCY_MS', 50)) / 1000
+MAX_DEPTH = int(os.environ.get('FAKE_UCI_DEPTH', 12))
+
+OPTIONS = [
+    'option name Skill Level type spin default 20 min 0 max 20',
+    'option name Hash type spin default 16 min 1 max 33554432',
+    'option name Threads type spin default 1 min 1 max 1024',
+    'option name Ponder type check default false',
+    'option name MultiPV type spin default 1 min 1 max 500',
+]
+
+output_lock = threading.Lock()
+
+
+def send(line):
+    with output_lock:
+        sys.stdout.write(line + '\n')
+        sys.stdout.flush()
+
+
+def parse_go(tokens):
+    params = {}
+    i = 0
+    while i < len(tokens):
+        if tokens[i] in ('infinite', 'ponder'):
+            params[tokens[i]] = True
+            i += 1
+        else:
+            params[tokens[i]] = tokens[i + 1] if i + 1 < len(tokens) else None
+            i += 2
+    return params
+
+
+def parse_position(tokens):
+    if tokens[0] == 'startpos':
+        board = chess.Board()
+        rest = tokens[1:]
+    else:
+        end = tokens.index('moves') if 'moves' in tokens else len(tokens)
+        board = chess.Board(' '.join(tokens[1:end]))
+        rest = tokens[end:]
+    for uci in rest[1:]:
+        board.push_uci(uci)
+    return board
+
+
+def search(board, params, stop):
+    depth_limit = min(int(params.get('depth') or MAX_DEPTH), MAX_DEPTH)
+    budget = LATENCY
+    if params.get('movetime'):
+        budget = min(budget, int(params['movetime']) / 1000)
+    rng = random.Random(board.fen())
+    moves = list(board.legal_moves)
+    best = rng.choice(moves) if moves else None
+    reply = None
+    if best is not None:
+        board.push(best)
+        reply = next(iter(board.legal_moves), None)
+        board.pop()
+    start = time.perf_counter()
+    for depth in range(1, depth_limit + 1):
+        if stop.wait(budget / depth_limit):
+            break
+        if best is None:
+            send(f"info depth {depth} score {'mate 0' if board.is_checkmate() else 'cp 0'}")
+            continue
+        pv = best.uci() + (f' {reply.uci()}' if reply else '')
+        elapsed = int((time.perf_counter() - start) * 1000)
+        send(f'info depth {depth} seldepth {depth} score cp {rng.randint(-60, 60)} '
+             f'nodes {depth * 2000} time {elapsed} pv {pv}')
+    if params.get('infinite') or params.get('ponder'):
+        stop.wait()
+    if best is None:
+        send('bestmove (none)')
+    else:
+        send(f'bestmove {best.uci()}' + (f' ponder {reply.uci()}' if reply else ''))
+
+
+def main():
+    board = chess.Board()
+    stop = threading.Event()
+    worker = None
+    for line in sys.stdin:
+        tokens = line.split()
+        if not tokens:
+            continue
+        command = tokens[0]
+        if command == 'uci':
+            send('id name FakeUCI')
+            send('id author chess-vs-ai bench')
+            for option in OPTIONS:
+                send(option)
+            send('uciok')
+        elif command == 'isready':
+            send('readyok')
+        elif command == 'ucinewgame':
+            board = chess.Board()
+        elif command == 'position':
+            board = parse_position(tokens[1:])
+        elif command == 'go':
+            stop.clear()
+            worker = threading.Thread(target=search, args=(board.copy(), parse_go(tokens[1:]), stop), daemon=True)
+            worker.start()
+        elif command in ('stop', 'ponderhit'):
+            stop.set()
+            if worker is not None:
+                worker.join()
+        elif command == 'quit':
+            break
+
+
+if __name__ == '__main__':
+    main()
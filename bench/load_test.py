@@ -0,0 +1,380 @@
+"""Drive the app with concurrent simulated players and report throughput and tail latency.
+
+The app is served over real HTTP on localhost. It runs on werkzeug's threaded
+server and uses the fake UCI engine (``bench/fake_uci.py``), so each search
+takes a fixed time and runs are repeatable. It uses a freshly seeded
+database in a temporary directory. Nothing touches the network or the
+repository's ``games.db``.
+
+Each simulated player logs in as a seeded user and resumes one of their
+games. It then loops until ``--duration`` runs out, picking an action from
+``--mix``: move, fen, hint, resume_game or user_games.
+
+For every endpoint the report shows req/s and p50/p95/p99 latency as the
+client saw them. It also shows where the server spent its time, averaged
+per request:
+
+    engine_wait  queueing for a pooled engine
+    engine       holding an engine (configure + search)
+    db           SQLite execute/commit on the request thread
+    serialize    building JSON responses
+    other        the rest of the handler (routing, sessions, chess logic)
+
+Save a run with ``--json`` and compare a later one against it with ``--compare``:
+
+    python bench/load_test.py --players 16 --duration 30 --latency-ms 50 --json before.json
+    python bench/load_test.py --players 16 --duration 30 --latency-ms 50 --compare before.json
+"""
+import argparse
+import http.cookiejar
+import json
+import logging
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from contextlib import contextmanager
+
+import chess
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+PHASES = ('engine_wait', 'engine', 'db', 'serialize', 'other')
+DEFAULT_MIX = 'move=50,fen=20,hint=10,resume_game=10,user_games=10'
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+# Per-request phase timings, accumulated on the thread that serves the request
+class PhaseTimer:
+    def __init__(self):
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+
+    def begin(self):
+        self.local.phases = dict.fromkeys(PHASES, 0.0)
+        self.local.started = time.perf_counter()
+
+    def add(self, phase, seconds):
+        phases = getattr(self.local, 'phases', None)
+        if phases is not None:
+            phases[phase] += seconds
+
+    def end(self, endpoint):
+        phases = getattr(self.local, 'phases', None)
+        if phases is None or endpoint is None:
+            return
+        total = time.perf_counter() - self.local.started
+        phases['other'] = max(0.0, total - sum(phases.values()))
+        self.local.phases = None
+        with self.lock:
+            self.samples[endpoint].append(phases)
+
+
+def instrument(chess_app, timer):
+    """Wrap the engine pool, the DB connection and JSON encoding with phase timers."""
+    pool = chess_app.engine_pool
+    checkout = pool.checkout
+
+    @contextmanager
+    def timed_checkout(*args, **kwargs):
+        start = time.perf_counter()
+        acquired = None
+        try:
+            with checkout(*args, **kwargs) as engine:
+                acquired = time.perf_counter()
+                timer.add('engine_wait', acquired - start)
+                yield engine
+        finally:
+            # A checkout that timed out or was shed still spent its time queueing
+            if acquired is None:
+                timer.add('engine_wait', time.perf_counter() - start)
+            else:
+                timer.add('engine', time.perf_counter() - acquired)
+
+    pool.checkout = timed_checkout
+
+    class TimedConnection(sqlite3.Connection):
+        def execute(self, *args):
+            start = time.perf_counter()
+            try:
+                return super().execute(*args)
+            finally:
+                timer.add('db', time.perf_counter() - start)
+
+        def executemany(self, *args):
+            start = time.perf_counter()
+            try:
+                return super().executemany(*args)
+            finally:
+                timer.add('db', time.perf_counter() - start)
+
+        def commit(self):
+            start = time.perf_counter()
+            try:
+                return super().commit()
+            finally:
+                timer.add('db', time.perf_counter() - start)
+
+    connect_db = chess_app.connect_db
+
+    def timed_connect_db():
+        return connect_db(factory=TimedConnection)
+
+    chess_app.connect_db = timed_connect_db
+
+    provider = chess_app.app.json
+    response = provider.response
+
+    def timed_response(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return response(*args, **kwargs)
+        finally:
+            timer.add('serialize', time.perf_counter() - start)
+
+    provider.response = timed_response
+
+    flask_app = chess_app.app
+    flask_app.before_request(timer.begin)
+
+    @flask_app.teardown_request
+    def record_phases(exception):
+        from flask import request
+        timer.end(request.endpoint)
+
+
+class Player:
+    def __init__(self, base_url, username, rng):
+        self.base_url = base_url
+        self.username = username
+        self.rng = rng
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+        self.board = None
+        self.player_color = 'White'
+        self.game_ids = []
+
+    def call(self, method, path, payload=None):
+        data = json.dumps(payload).encode() if payload is not None else None
+        req = urllib.request.Request(self.base_url + path, data=data, method=method,
+                                     headers={'Content-Type': 'application/json'})
+        try:
+            with self.opener.open(req, timeout=60) as resp:
+                return resp.status, json.loads(resp.read() or b'null')
+        except urllib.error.HTTPError as e:
+            body = e.read()
+            try:
+                return e.code, json.loads(body or b'null')
+            except ValueError:
+                return e.code, None
+
+    def track(self, body):
+        if isinstance(body, dict) and body.get('fen'):
+            self.board = chess.Board(body['fen'])
+            self.player_color = body.get('player_color', self.player_color)
+
+    def player_to_move(self):
+        return (self.board is not None and not self.board.is_game_over()
+                and self.board.turn == (self.player_color == 'White'))
+
+    def login(self):
+        status, _ = self.call('POST', '/login', {'username': self.username, 'password': 'bench'})
+        if status != 200:
+            raise RuntimeError(f"Login failed for {self.username}: HTTP {status}")
+        status, body = self.call('POST', '/user_games', {})
+        self.game_ids = [game['game_id'] for game in (body or {}).get('games', [])]
+        self.track(self.resume_game()[1])
+
+    def new_game(self):
+        return self.call('POST', '/move', {'move': 'reset', 'player_color': self.rng.choice(('White', 'Black')),
+                                           'difficulty': self.rng.choice(('Easy', 'Medium', 'Hard'))})
+
+    def resume_game(self):
+        if not self.game_ids:
+            return self.new_game()
+        return self.call('POST', '/resume_game', {'game_id': self.rng.choice(self.game_ids)})
+
+    def move(self):
+        if not self.player_to_move():
+            return self.new_game()
+        move = self.rng.choice(list(self.board.legal_moves))
+        return self.call('POST', '/move', {'move': move.uci()})
+
+    def act(self, action):
+        if action == 'move':
+            return self.move()
+        if action == 'fen':
+            return self.call('GET', '/fen')
+        if action == 'hint':
+            return self.call('GET', '/hint')
+        if action == 'resume_game':
+            return self.resume_game()
+        return self.call('POST', '/user_games', {})
+
+
+def run_player(player, mix, deadline, results, lock):
+    actions, weights = zip(*mix.items())
+    player.login()
+    while time.monotonic() < deadline:
+        action = player.rng.choices(actions, weights)[0]
+        start = time.perf_counter()
+        status, body = player.act(action)
+        elapsed = time.perf_counter() - start
+        if action != 'user_games' and action != 'hint':
+            player.track(body)
+        with lock:
+            results[action].append((elapsed, status))
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        mix[name.strip()] = float(weight)
+    return mix
+
+
+def summarize(results, samples, duration):
+    endpoint_for = {'move': 'make_move', 'fen': 'get_fen', 'hint': 'get_hint',
+                    'resume_game': 'resume_game', 'user_games': 'user_games'}
+    report = {}
+    for action, calls in sorted(results.items()):
+        latencies = [elapsed for elapsed, _ in calls]
+        phases = samples.get(endpoint_for[action], [])
+        report[action] = {
+            'requests': len(calls),
+            'errors': sum(1 for _, status in calls if status >= 400),
+            'rps': len(calls) / duration,
+            'p50_ms': percentile(latencies, 0.50) * 1000,
+            'p95_ms': percentile(latencies, 0.95) * 1000,
+            'p99_ms': percentile(latencies, 0.99) * 1000,
+            'phases_ms': {phase: sum(p[phase] for p in phases) / len(phases) * 1000 if phases else 0.0
+                          for phase in PHASES},
+        }
+    latencies = [elapsed for calls in results.values() for elapsed, _ in calls]
+    report['total'] = {
+        'requests': len(latencies),
+        'errors': sum(1 for calls in results.values() for _, status in calls if status >= 400),
+        'rps': len(latencies) / duration,
+        'p50_ms': percentile(latencies, 0.50) * 1000,
+        'p95_ms': percentile(latencies, 0.95) * 1000,
+        'p99_ms': percentile(latencies, 0.99) * 1000,
+    }
+    return report
+
+
+def print_report(report, baseline=None):
+    header = f"{'endpoint':<12}{'reqs':>7}{'err':>5}{'req/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}  " + \
+             ''.join(f'{phase:>12}' for phase in PHASES)
+    print(header)
+    print('-' * len(header))
+    for action, row in report.items():
+        phases = ''.join(f"{row['phases_ms'][phase]:>12.2f}" for phase in PHASES) if 'phases_ms' in row else ''
+        print(f"{action:<12}{row['requests']:>7}{row['errors']:>5}{row['rps']:>9.1f}"
+              f"{row['p50_ms']:>9.1f}{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}  {phases}")
+    print('latencies in ms (client side); phases are mean server time per request in ms')
+    if baseline:
+        print('\nchange against baseline (negative latency / positive req/s is better):')
+        for action, row in report.items():
+            old = baseline.get('endpoints', {}).get(action)
+            if not old:
+                continue
+            deltas = []
+            for key in ('rps', 'p50_ms', 'p95_ms', 'p99_ms'):
+                if old[key]:
+                    deltas.append(f"{key} {100 * (row[key] - old[key]) / old[key]:+.1f}%")
+            print(f"  {action:<12}" + ', '.join(deltas))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=16, help='concurrent simulated players')
+    parser.add_argument('--duration', type=float, default=20, help='seconds to drive load')
+    parser.add_argument('--mix', default=DEFAULT_MIX, help='action weights, e.g. "move=50,fen=20,hint=10"')
+    parser.add_argument('--latency-ms', type=float, default=50, help='fake engine search time')
+    parser.add_argument('--pool-size', type=int, default=2, help='ENGINE_POOL_SIZE for the app')
+    parser.add_argument('--no-ponder', action='store_true', help='disable pondering in the app')
+    parser.add_argument('--users', type=int, default=200, help='users to seed')
+    parser.add_argument('--games', type=int, default=20, help='maximum seeded games per user')
+    parser.add_argument('--plies', type=int, default=120, help='maximum plies per seeded game')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--json', help='write the results to this file')
+    parser.add_argument('--compare', help='baseline results written by an earlier --json run')
+    args = parser.parse_args()
+
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+    workdir = tempfile.mkdtemp(prefix='chess-bench-')
+    db_path = os.path.join(workdir, 'games.db')
+    os.environ.update({
+        'DATABASE': db_path,
+        'STOCKFISH_PATH': os.path.join(BENCH_DIR, 'fake_uci.py'),
+        'FAKE_UCI_LATENCY_MS': str(args.latency_ms),
+        'ENGINE_POOL_SIZE': str(args.pool_size),
+        'PONDER_ENABLED': '0' if args.no_ponder else '1',
+        # Console logging would dominate the numbers; app.log in the scratch dir still has it all
+        'LOG_CONSOLE': '0',
+        'LOG_FILE': os.path.join(workdir, 'app.log'),
+    })
+    # Anything else the app writes relative to the working directory lands there too
+    os.chdir(workdir)
+    sys.path.insert(0, BENCH_DIR)
+    from seed_db import seed
+    start = time.perf_counter()
+    users, games, plies = seed(db_path, args.users, args.games, args.plies, args.seed)
+    print(f"Seeded {users} users, {games} games, {plies} plies in {time.perf_counter() - start:.1f}s ({workdir})")
+
+    import app as chess_app
+    from werkzeug.serving import make_server
+    chess_app.limiter.enabled = False
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    timer = PhaseTimer()
+    instrument(chess_app, timer)
+    server = make_server('127.0.0.1', 0, chess_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-server', daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    mix = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    results = defaultdict(list)
+    lock = threading.Lock()
+    deadline = time.monotonic() + args.duration
+    players = [Player(base_url, f'bench{rng.randrange(users)}', random.Random(rng.random()))
+               for _ in range(args.players)]
+    threads = [threading.Thread(target=run_player, args=(player, mix, deadline, results, lock))
+               for player in players]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+    server.shutdown()
+
+    report = summarize(results, timer.samples, duration)
+    baseline = None
+    if compare_path:
+        with open(compare_path) as f:
+            baseline = json.load(f)
+    print(f"\n{args.players} players for {duration:.1f}s, engine latency {args.latency_ms:g}ms, "
+          f"pool size {args.pool_size}")
+    print_report(report, baseline)
+    print(f"\nengine pool: {json.dumps(chess_app.engine_pool.stats()['queue'])}")
+    if json_path:
+        with open(json_path, 'w') as f:
+            json.dump({'config': vars(args), 'duration': duration, 'endpoints': report}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""Compare the cost of persisting a game one ply at a time under the storage schemes.
+
+``json``: the original layout, where every ply rewrites the whole ``move_history``
+JSON list and the FEN in the ``games`` row.
+``rows``: a ``moves`` table with one row per ply (one packed 16-bit move each),
+a small ``games`` row update and a FEN checkpoint every ``--checkpoint`` plies.
+``packed``: the app's layout, where the packed 16-bit moves are one blob in the
+``games`` row, rewritten along with the row, and FEN checkpoints are as sparse.
+
+Games are played interleaved, as concurrent players would, and committed every
+``--batch`` plies. The WAL is never checkpointed during a run, so its final size
+is the number of bytes SQLite physically wrote. Runs offline against temporary
+databases:
+
+    python bench/move_log_write_amplification.py --games 200 --plies 120 --batch 50
+"""
+import argparse
+import atexit
+import json
+import os
+import random
+import shutil
+import sqlite3
+import sys
+import tempfile
+import time
+
+import chess
+
+# The encoders come from the app itself so the benchmark measures what it stores. Importing it
+# must not touch the working directory's database or log.
+_scratch = tempfile.mkdtemp(prefix='move-log-bench-')
+atexit.register(shutil.rmtree, _scratch, True)
+os.environ['DATABASE'] = os.path.join(_scratch, 'app.db')
+os.environ['LOG_FILE'] = os.path.join(_scratch, 'app.log')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from app import encode_move, pack_moves  # noqa: E402
+
+
+def random_game(plies, rng):
+    board = chess.Board()
+    moves = []
+    while len(moves) < plies and not board.is_game_over():
+        move = rng.choice(list(board.legal_moves))
+        board.push(move)
+        moves.append((move.uci(), board.fen()))
+    return moves
+
+
+def open_db(path):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute("PRAGMA synchronous = NORMAL")
+    conn.execute("PRAGMA wal_autocheckpoint = 0")
+    conn.execute('''CREATE TABLE games (
+        game_id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, fen TEXT NOT NULL,
+        move_history TEXT NOT NULL, player_color TEXT NOT NULL, probability REAL,
+        created_at TEXT NOT NULL, updated_at TEXT NOT NULL,
+        ply_count INTEGER NOT NULL DEFAULT 0, checkpoint_ply INTEGER NOT NULL DEFAULT 0,
+        packed_moves BLOB NOT NULL DEFAULT x'')''')
+    conn.execute('''CREATE TABLE moves (game_id INTEGER NOT NULL, ply INTEGER NOT NULL, move INTEGER NOT NULL,
+        PRIMARY KEY (game_id, ply)) WITHOUT ROWID''')
+    conn.commit()
+    return conn
+
+
+def interleaved(games):
+    # All games progress together, one ply each per round, like concurrent players
+    for ply in range(max(len(moves) for moves in games)):
+        for game_id, moves in enumerate(games, start=1):
+            if ply < len(moves):
+                yield game_id, ply, moves
+
+
+def insert_games(conn, games):
+    conn.executemany("INSERT INTO games (game_id, user_id, fen, move_history, player_color, created_at, updated_at) "
+                     "VALUES (?, 'bench', ?, '[]', 'White', 'now', 'now')",
+                     [(game_id, chess.STARTING_FEN) for game_id in range(1, len(games) + 1)])
+    conn.commit()
+
+
+def run_json(conn, games, batch):
+    insert_games(conn, games)
+    logical = 0
+    for n, (game_id, ply, moves) in enumerate(interleaved(games), start=1):
+        payload = json.dumps([move for move, _ in moves[:ply + 1]])
+        fen = moves[ply][1]
+        conn.execute("UPDATE games SET fen = ?, move_history = ?, probability = ?, updated_at = ? WHERE game_id = ?",
+                     (fen, payload, 50.0, 'now', game_id))
+        logical += len(fen) + len(payload)
+        if n % batch == 0:
+            conn.commit()
+    conn.commit()
+    return logical
+
+
+def run_rows(conn, games, batch, checkpoint):
+    insert_games(conn, games)
+    logical = 0
+    for n, (game_id, ply, moves) in enumerate(interleaved(games), start=1):
+        move, fen = moves[ply]
+        conn.execute("INSERT INTO moves (game_id, ply, move) VALUES (?, ?, ?)", (game_id, ply, encode_move(move)))
+        conn.execute("UPDATE games SET ply_count = ?, probability = ?, updated_at = ? WHERE game_id = ?",
+                     (ply + 1, 50.0, 'now', game_id))
+        logical += 2
+        if (ply + 1) % checkpoint == 0:
+            conn.execute("UPDATE games SET fen = ?, checkpoint_ply = ? WHERE game_id = ?", (fen, ply + 1, game_id))
+            logical += len(fen)
+        if n % batch == 0:
+            conn.commit()
+    conn.commit()
+    return logical
+
+
+def run_packed(conn, games, batch, checkpoint):
+    insert_games(conn, games)
+    logical = 0
+    packed = {}
+    for n, (game_id, ply, moves) in enumerate(interleaved(games), start=1):
+        move, fen = moves[ply]
+        packed[game_id] = packed.get(game_id, b'') + pack_moves([move])
+        conn.execute("UPDATE games SET ply_count = ?, packed_moves = ?, probability = ?, updated_at = ? WHERE game_id = ?",
+                     (ply + 1, packed[game_id], 50.0, 'now', game_id))
+        logical += len(packed[game_id])
+        if (ply + 1) % checkpoint == 0:
+            conn.execute("UPDATE games SET fen = ?, checkpoint_ply = ? WHERE game_id = ?", (fen, ply + 1, game_id))
+            logical += len(fen)
+        if n % batch == 0:
+            conn.commit()
+    conn.commit()
+    return logical
+
+
+def measure(name, games, runner, *args):
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        conn = open_db(path)
+        wal_before = os.path.getsize(path + '-wal')
+        start = time.perf_counter()
+        logical = runner(conn, games, *args)
+        elapsed = time.perf_counter() - start
+        wal_bytes = os.path.getsize(path + '-wal') - wal_before
+        conn.close()
+    plies = sum(len(moves) for moves in games)
+    print(f"{name:>6}: {plies} plies in {elapsed:.2f}s ({plies / elapsed:,.0f} plies/s), "
+          f"payload {logical / plies:,.0f} B/ply, WAL {wal_bytes / plies:,.0f} B/ply")
+    return elapsed, logical, wal_bytes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--games', type=int, default=100)
+    parser.add_argument('--plies', type=int, default=120)
+    parser.add_argument('--checkpoint', type=int, default=20)
+    parser.add_argument('--batch', type=int, default=1, help='plies per commit (1 = write-through, >1 = write-behind flush)')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    games = [random_game(args.plies, rng) for _ in range(args.games)]
+    json_result = measure('json', games, run_json, args.batch)
+    measure('rows', games, run_rows, args.batch, args.checkpoint)
+    packed_result = measure('packed', games, run_packed, args.batch, args.checkpoint)
+    # Ratios above 1 favour the packed log. SQLite writes whole pages; the packed log only ever
+    # touches the games row's page, so it writes no more pages than the JSON layout and, with
+    # its smaller rows, fewer pages per batch.
+    time_ratio, payload_ratio, wal_ratio = (j / p for j, p in zip(json_result, packed_result))
+    print(f"json/packed: time {time_ratio:.1f}x, payload {payload_ratio:.0f}x, WAL {wal_ratio:.2f}x")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,103 @@
+"""Fill a games database with benchmark users and long, realistic game histories.
+
+The seeder creates users ``bench0`` .. ``bench<N-1>``, all with the password
+``bench``. Each user gets a random number of games of random legal moves. The
+games are written in the app's storage layout: a packed move log plus periodic
+FEN checkpoints. Each stored game ends with the player to move, so a resumed
+game can go straight on. The schema comes from the app's own migrations:
+
+    python bench/seed_db.py --db /tmp/bench.db --users 500 --games 20 --plies 160
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import chess
+
+PASSWORD = 'bench'
+
+
+def random_game(rng, max_plies, player_color):
+    board = chess.Board()
+    target = rng.randint(max_plies // 4, max_plies)
+    while board.ply() < target and not board.is_game_over():
+        board.push(rng.choice(list(board.legal_moves)))
+    # Leave the player to move, as after the AI's reply
+    player_turn = chess.WHITE if player_color == 'White' else chess.BLACK
+    if board.turn != player_turn and not board.is_game_over():
+        board.pop()
+    return board
+
+
+def seed(db_path, users=200, games_per_user=20, max_plies=120, rng_seed=1, checkpoint_interval=None):
+    """Seed ``db_path`` and return the number of users, games and plies written."""
+    os.environ['DATABASE'] = db_path
+    # Importing the app opens its log file; put it next to the database, not in the working directory
+    os.environ.setdefault('LOG_FILE', os.path.join(os.path.dirname(os.path.abspath(db_path)), 'app.log'))
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import app as chess_app
+    from werkzeug.security import generate_password_hash
+
+    chess_app.app.config['DATABASE'] = db_path
+    chess_app.init_db()
+    chess_app.db_schema_ready = True
+    checkpoint_interval = checkpoint_interval or chess_app.app.config['CHECKPOINT_INTERVAL']
+    rng = random.Random(rng_seed)
+    # Hashing is deliberately slow; every bench user shares one hash
+    password_hash = generate_password_hash(PASSWORD)
+    now = datetime.utcnow()
+    conn = sqlite3.connect(db_path)
+    conn.execute("PRAGMA synchronous = OFF")
+    total_games = total_plies = 0
+    for n in range(users):
+        cursor = conn.execute("INSERT OR IGNORE INTO users (username, password) VALUES (?, ?)",
+                              (f'bench{n}', password_hash))
+        user_id = cursor.lastrowid if cursor.rowcount else conn.execute(
+            "SELECT id FROM users WHERE username = ?", (f'bench{n}',)).fetchone()[0]
+        for _ in range(rng.randint(1, games_per_user)):
+            player_color = rng.choice(('White', 'Black'))
+            board = random_game(rng, max_plies, player_color)
+            plies = board.ply()
+            checkpoint_ply = plies if board.is_game_over() else plies - plies % checkpoint_interval
+            checkpoint = board.copy()
+            while checkpoint.ply() > checkpoint_ply:
+                checkpoint.pop()
+            # Keep inside the retention window so the cleanup thread leaves them alone
+            created = now - timedelta(days=rng.uniform(0, 3))
+            updated = created + timedelta(minutes=rng.uniform(1, 90))
+            conn.execute('''INSERT INTO games (user_id, fen, move_history, player_color, difficulty, probability,
+                            created_at, updated_at, ply_count, checkpoint_ply, result, last_move, packed_moves)
+                            VALUES (?, ?, '[]', ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)''',
+                         (str(user_id), checkpoint.fen(), player_color, rng.choice(('Easy', 'Medium', 'Hard')),
+                          rng.uniform(5, 95), created.isoformat(), updated.isoformat(), plies, checkpoint_ply,
+                          chess_app.game_result(board), board.peek().uci() if board.move_stack else None,
+                          chess_app.pack_moves([move.uci() for move in board.move_stack])))
+            total_games += 1
+            total_plies += plies
+        if n % 100 == 99:
+            conn.commit()
+    conn.commit()
+    conn.close()
+    return users, total_games, total_plies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--db', required=True, help='database to fill, e.g. /tmp/bench.db (never the live games.db)')
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--games', type=int, default=20, help='maximum games per user')
+    parser.add_argument('--plies', type=int, default=120, help='maximum plies per game')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    users, games, plies = seed(os.path.abspath(args.db), args.users, args.games, args.plies, args.seed)
+    print(f"Seeded {args.db}: {users} users, {games} games, {plies} plies in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,340 @@
+import chess
+import chess.engine
+import heapq
+import itertools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+
+from metrics import REGISTRY
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the engine process itself is gone or wedged and must be replaced
+ENGINE_FAILURES = (chess.engine.EngineTerminatedError, chess.engine.EngineError, TimeoutError, BrokenPipeError)
+
+
+# Checkout priority classes; lower values are served first when engines are scarce
+PRIORITY_MOVE = 0
+PRIORITY_HINT = 1
+PRIORITY_EVAL = 2
+PRIORITY_ANALYSIS = 3
+PRIORITY_PONDER = 4
+PRIORITY_NAMES = {PRIORITY_MOVE: 'move', PRIORITY_HINT: 'hint', PRIORITY_EVAL: 'eval', PRIORITY_ANALYSIS: 'analysis',
+                  PRIORITY_PONDER: 'ponder'}
+
+
+ENGINE_SPAWN_SECONDS = REGISTRY.histogram('chess_engine_spawn_seconds', 'Time to start and handshake a UCI engine process')
+ENGINE_WAIT_SECONDS = REGISTRY.histogram('chess_engine_checkout_wait_seconds', 'Time spent queueing for a pooled engine',
+                                         ['priority'])
+ENGINE_HOLD_SECONDS = REGISTRY.histogram('chess_engine_checkout_seconds', 'Time an engine stays checked out',
+                                         ['priority'])
+
+
+class EngineUnavailableError(Exception):
+    """Raised when no engine could be checked out of the pool."""
+
+
+class EngineBusyError(EngineUnavailableError):
+    """Raised when a checkout is shed because the wait queue is full."""
+
+
+def play_until_stable(engine, board, limit, stable_depths, min_depth=0, game=None):
+    """Search like ``engine.play`` but stop as soon as the best move has stayed the same for
+    ``stable_depths`` consecutive depths at or beyond ``min_depth`` (``limit`` still applies).
+    Returns a ``PlayResult`` whose ``info`` holds the score and PV of the last update."""
+    remote = getattr(engine, 'play_until_stable', None)
+    if remote is not None:
+        # Engines in another process run the loop there, next to the engine
+        return remote(board, limit, stable_depths, min_depth, game=game)
+    best, streak, depth = None, 0, 0
+    with engine.analysis(board, limit, game=game) as analysis:
+        for info in analysis:
+            if 'pv' not in info or info.get('depth', 0) <= depth:
+                continue
+            depth = info['depth']
+            streak = streak + 1 if info['pv'][0] == best else 1
+            best = info['pv'][0]
+            if streak >= stable_depths and depth >= min_depth:
+                break
+        else:
+            best = analysis.wait().move
+        pv = analysis.info.get('pv', [best])
+        return chess.engine.PlayResult(best, pv[1] if len(pv) > 1 else None, analysis.info)
+
+
+def play_with_lines(engine, board, limit, game=None, started=None):
+    """Search like ``engine.play`` but keep the last update of every line the engine reported:
+    below Skill Level 20 the engine searches several and may play any of them. The ``PlayResult``
+    has the principal line as ``info`` and all of them, best first, as ``lines``. ``started`` is
+    called with the running analysis, e.g. to stop it early."""
+    remote = getattr(engine, 'play_with_lines', None)
+    if remote is not None:
+        return remote(board, limit, game=game)
+    with engine.analysis(board, limit, game=game) as analysis:
+        if started is not None:
+            started(analysis)
+        best = analysis.wait()
+        lines = [info for info in analysis.multipv if info]
+    result = chess.engine.PlayResult(best.move, best.ponder, lines[0] if lines else {})
+    result.lines = lines
+    return result
+
+
+# Bounded pool of long-lived UCI engines shared by all request threads
+class EnginePool:
+    def __init__(self, engine_path, size=2, default_options=None, spawn_timeout=10.0, spawn_retries=3, max_waiting=16):
+        self.engine_path = engine_path
+        self.size = size
+        self.max_waiting = max_waiting
+        self.default_options = dict(default_options or {})
+        self.spawn_timeout = spawn_timeout
+        self.spawn_retries = spawn_retries
+        self._idle = []
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._configured = {}
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+        # Heap of [priority, seq, shed] entries for checkouts waiting on an engine
+        self._waiting = []
+        self._seq = itertools.count()
+        self._wait_stats = {name: {'served': 0, 'wait_total': 0.0, 'wait_max': 0.0, 'timeouts': 0, 'shed': 0}
+                            for name in PRIORITY_NAMES.values()}
+        self.spawned = 0
+        self.respawned = 0
+
+    def _spawn(self):
+        for attempt in range(self.spawn_retries):
+            try:
+                with ENGINE_SPAWN_SECONDS.time():
+                    engine = chess.engine.SimpleEngine.popen_uci(self.engine_path, timeout=self.spawn_timeout)
+                self.spawned += 1
+                logger.info(f"Stockfish initialized from {self.engine_path}")
+                return engine
+            except Exception as e:
+                logger.error(f"Failed to initialize Stockfish (attempt {attempt + 1}/{self.spawn_retries}): {e}")
+                if attempt < self.spawn_retries - 1:
+                    time.sleep(1)  # Wait 1 second before retrying
+        return None
+
+    def _discard(self, engine):
+        try:
+            engine.quit()
+        except Exception:
+            try:
+                engine.close()
+            except Exception:
+                pass
+        with self._lock:
+            self._created -= 1
+            self._configured.pop(id(engine), None)
+            # A waiter may now spawn a replacement
+            self._available.notify_all()
+        logger.warning("Discarded crashed Stockfish engine")
+
+    def _take_idle(self, options):
+        # Prefer an engine already configured the same way: changing Hash reallocates its table
+        for index in range(len(self._idle) - 1, -1, -1):
+            if self._configured.get(id(self._idle[index])) == options:
+                return self._idle.pop(index)
+        return self._idle.pop()
+
+    def _claim(self, options):
+        # Called with the lock held: an idle engine, True if a new one may be spawned, or None
+        if self._idle:
+            return self._take_idle(options)
+        if self._created < self.size:
+            self._created += 1
+            return True
+        return None
+
+    def _enqueue(self, priority):
+        # Called with the lock held. A full queue sheds its lowest-priority waiter to make room
+        # for a more urgent checkout, otherwise the newcomer is the one turned away
+        if len(self._waiting) >= self.max_waiting:
+            victim = max(self._waiting)
+            if victim[0] <= priority:
+                self._wait_stats[PRIORITY_NAMES[priority]]['shed'] += 1
+                raise EngineBusyError(f"Engine queue is full ({len(self._waiting)} waiting)")
+            victim[2] = True
+            self._dequeue(victim)
+        entry = [priority, next(self._seq), False]
+        heapq.heappush(self._waiting, entry)
+        return entry
+
+    def _dequeue(self, entry):
+        self._waiting.remove(entry)
+        heapq.heapify(self._waiting)
+        # The head of the queue may have changed
+        self._available.notify_all()
+
+    def _acquire(self, timeout, options=None, priority=PRIORITY_MOVE):
+        started = time.monotonic()
+        deadline = started + timeout
+        stats = self._wait_stats[PRIORITY_NAMES[priority]]
+        with self._lock:
+            if self._closed:
+                raise EngineUnavailableError("Engine pool is closed")
+            claimed = None if self._waiting else self._claim(options)
+            if claimed is None:
+                if timeout <= 0:
+                    raise EngineUnavailableError("Every engine is busy")
+                entry = self._enqueue(priority)
+                try:
+                    while True:
+                        if entry[2]:
+                            stats['shed'] += 1
+                            raise EngineBusyError("Shed from the engine queue for more urgent work")
+                        if self._closed:
+                            raise EngineUnavailableError("Engine pool is closed")
+                        if self._waiting[0] is entry:
+                            claimed = self._claim(options)
+                            if claimed is not None:
+                                break
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            stats['timeouts'] += 1
+                            raise EngineUnavailableError(f"No engine became free within {timeout}s")
+                        self._available.wait(remaining)
+                finally:
+                    if entry in self._waiting:
+                        self._dequeue(entry)
+            waited = time.monotonic() - started
+            stats['served'] += 1
+            stats['wait_total'] += waited
+            stats['wait_max'] = max(stats['wait_max'], waited)
+        ENGINE_WAIT_SECONDS.observe(waited, priority=PRIORITY_NAMES[priority])
+        if claimed is not True:
+            return claimed
+        engine = self._spawn()
+        if engine is None:
+            with self._lock:
+                self._created -= 1
+                self._available.notify_all()
+            raise EngineUnavailableError("Failed to start Stockfish")
+        return engine
+
+    def saturated(self):
+        """True when a new checkout would have to queue for an engine."""
+        with self._lock:
+            return bool(self._waiting) or (not self._idle and self._created >= self.size)
+
+    def _is_alive(self, engine):
+        try:
+            engine.ping()
+            return True
+        except Exception:
+            return False
+
+    @contextmanager
+    def checkout(self, options=None, timeout=30.0, priority=PRIORITY_MOVE):
+        """Borrow an engine for the duration of a ``with`` block.
+
+        Options are reset to the pool defaults (plus ``options``) on every
+        checkout so one game's Skill Level never leaks into another. Pass a
+        ``game`` key to ``play``/``analyse`` so python-chess sends
+        ``ucinewgame`` whenever the engine switches to a different game.
+        A ``timeout`` of 0 returns immediately if every engine is busy.
+        When engines are scarce, waiting checkouts are served in
+        ``priority`` order and the least urgent are shed once
+        ``max_waiting`` checkouts are queued.
+        """
+        options = {**self.default_options, **(options or {})}
+        engine = self._acquire(timeout, options, priority)
+        if not self._is_alive(engine):
+            self.respawned += 1
+            self._discard(engine)
+            engine = self._acquire(timeout, options, priority)
+        with self._lock:
+            self._in_use += 1
+        healthy = True
+        checked_out = time.perf_counter()
+        try:
+            engine.configure(options)
+            self._configured[id(engine)] = options
+            yield engine
+        except ENGINE_FAILURES:
+            healthy = False
+            raise
+        finally:
+            ENGINE_HOLD_SECONDS.observe(time.perf_counter() - checked_out, priority=PRIORITY_NAMES[priority])
+            with self._lock:
+                self._in_use -= 1
+                returned = healthy and not self._closed
+                if returned:
+                    self._idle.append(engine)
+                    self._available.notify_all()
+            if not healthy:
+                self.respawned += 1
+                self._discard(engine)
+            elif not returned:
+                try:
+                    engine.quit()
+                except Exception:
+                    pass
+
+    def ping(self):
+        """Check the pool can serve work without queueing or reconfiguring any engine.
+
+        Sends ``isready`` to an idle engine, spawning the first one if the
+        pool is still empty. Returns ``(ready, detail)``: engines that are
+        all busy still count as ready, a full wait queue does not.
+        """
+        with self._lock:
+            if self._closed:
+                return False, 'pool closed'
+            if len(self._waiting) >= self.max_waiting:
+                return False, f'engine queue full ({len(self._waiting)} waiting)'
+            if self._waiting or (not self._idle and self._created >= self.size):
+                return True, 'all engines busy'
+            engine = self._idle.pop() if self._idle else None
+            if engine is None:
+                self._created += 1
+            self._in_use += 1
+        if engine is None:
+            engine = self._spawn()
+            if engine is None:
+                with self._lock:
+                    self._created -= 1
+                    self._in_use -= 1
+                    self._available.notify_all()
+                return False, 'failed to start engine'
+        alive = self._is_alive(engine)
+        with self._lock:
+            self._in_use -= 1
+            returned = alive and not self._closed
+            if returned:
+                self._idle.append(engine)
+                self._available.notify_all()
+        if not alive:
+            self.respawned += 1
+            self._discard(engine)
+            return False, 'engine did not answer isready'
+        if not returned:
+            engine.quit()
+        return True, 'ok'
+
+    def stats(self):
+        with self._lock:
+            queue = {name: dict(stats, queued=0, wait_avg=stats['wait_total'] / stats['served'] if stats['served'] else 0.0)
+                     for name, stats in self._wait_stats.items()}
+            for priority, _, _ in self._waiting:
+                queue[PRIORITY_NAMES[priority]]['queued'] += 1
+            return {'size': self.size, 'created': self._created, 'in_use': self._in_use,
+                    'idle': len(self._idle), 'spawned': self.spawned, 'respawned': self.respawned,
+                    'queue_depth': len(self._waiting), 'queue': queue}
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._available.notify_all()
+        for engine in idle:
+            try:
+                engine.quit()
+                logger.info("Stockfish engine closed")
+            except Exception as e:
+                logger.error(f"Failed to close Stockfish engine: {e}")
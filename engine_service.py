@@ -0,0 +1,300 @@
+import argparse
+import atexit
+import logging
+import os
+import secrets
+import signal
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from multiprocessing.connection import AuthenticationError, Client, Listener
+
+import chess
+import chess.engine
+
+from engine_pool import (EngineBusyError, EnginePool, EngineUnavailableError, PRIORITY_MOVE, play_until_stable,
+                         play_with_lines)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = '/tmp/chess-vs-ai-engines.sock'
+
+
+def authkey_path(address):
+    return address + '.key'
+
+
+def load_authkey(path, create=False):
+    """The engine service key stored in ``path``, or None if there is no such file. With
+    ``create``, a random key is written there first (readable by this user only) if it is missing.
+    A key file anyone else could have written or read is refused."""
+    if create:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, 'w') as f:
+                f.write(secrets.token_hex(32))
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except FileNotFoundError:
+        return None
+    with os.fdopen(fd) as f:
+        stat = os.fstat(f.fileno())
+        if stat.st_uid != os.getuid() or stat.st_mode & 0o077:
+            raise PermissionError(f"Engine service key {path} must belong to this user and be private to it (mode 0600)")
+        return f.read().strip() or None
+
+
+def _authkey_bytes(authkey):
+    # Requests are unpickled on arrival, so nobody may connect without a key
+    if not authkey:
+        raise ValueError("The engine service needs an authkey: set ENGINE_SERVICE_AUTHKEY or use its key file")
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+def _job_key(request):
+    # Two searches are interchangeable when the engine sees the same position, the same plies that
+    # could still repeat, the same limit and the same options; which game asked does not matter.
+    # They must also queue alike: a joiner gets the owner's place in the queue, its deadline and
+    # its chance of being shed, so only searches of the same priority and timeout are shared.
+    board = request['board']
+    recent = board.move_stack[max(0, len(board.move_stack) - board.halfmove_clock):] if board.halfmove_clock else []
+    return (request['op'], board.fen(), tuple(move.uci() for move in recent), repr(request['limit']),
+            tuple(sorted((request.get('options') or {}).items())), request.get('stable'), request.get('lines'),
+            request.get('info'), request.get('priority', PRIORITY_MOVE), request.get('timeout', 30.0))
+
+
+# Standalone process owning the host's engine fleet; web workers send it searches over a Unix
+# socket, and identical searches that are in flight at the same time share one engine run
+class EngineService:
+    def __init__(self, pool, address=DEFAULT_ADDRESS, authkey=None):
+        self.pool = pool
+        self.address = address
+        self.authkey = _authkey_bytes(authkey)
+        self._listener = None
+        self._closed = False
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self.jobs = 0
+        self.deduplicated = 0
+
+    def _run_job(self, request):
+        board, limit, game = request['board'], request['limit'], request.get('game')
+        with self.pool.checkout(request.get('options'), timeout=request.get('timeout', 30.0),
+                                priority=request.get('priority', PRIORITY_MOVE)) as engine:
+            if request['op'] == 'analyse':
+                return engine.analyse(board, limit, game=game)
+            if request.get('stable'):
+                stable_depths, min_depth = request['stable']
+                return play_until_stable(engine, board, limit, stable_depths, min_depth, game=game)
+            if request.get('lines'):
+                return play_with_lines(engine, board, limit, game=game)
+            return engine.play(board, limit, info=request.get('info', chess.engine.INFO_NONE), game=game)
+
+    def _search(self, request):
+        key = _job_key(request)
+        with self._lock:
+            self.jobs += 1
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+            else:
+                self.deduplicated += 1
+        if owner:
+            try:
+                future.set_result(self._run_job(request))
+            except Exception as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    del self._inflight[key]
+        return future.result()
+
+    def handle(self, request):
+        op = request.get('op')
+        if op in ('play', 'analyse'):
+            return self._search(request)
+        if op == 'ping':
+            return self.pool.ping()
+        if op == 'saturated':
+            return self.pool.saturated()
+        if op == 'stats':
+            with self._lock:
+                service = {'jobs': self.jobs, 'deduplicated': self.deduplicated, 'inflight': len(self._inflight)}
+            return dict(self.pool.stats(), service=service)
+        raise ValueError(f"Unknown engine service operation {op!r}")
+
+    def _serve_connection(self, conn):
+        with conn:
+            while True:
+                try:
+                    request = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    response = {'ok': True, 'result': self.handle(request)}
+                except EngineBusyError as e:
+                    response = {'ok': False, 'kind': 'busy', 'error': str(e)}
+                except EngineUnavailableError as e:
+                    response = {'ok': False, 'kind': 'unavailable', 'error': str(e)}
+                except Exception as e:
+                    logger.error(f"Engine service job failed: {e}")
+                    response = {'ok': False, 'kind': 'engine', 'error': f"{type(e).__name__}: {e}"}
+                try:
+                    conn.send(response)
+                except (EOFError, OSError):
+                    return
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)  # Left behind by a previous run
+        # Bind under a umask that leaves the socket private from the start, not after a chmod
+        umask = os.umask(0o177)
+        try:
+            self._listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        finally:
+            os.umask(umask)
+        logger.info(f"Engine service listening on {self.address} with {self.pool.size} engines")
+        while not self._closed:
+            try:
+                conn = self._listener.accept()
+            except (AuthenticationError, EOFError) as e:
+                logger.warning(f"Rejected engine service client: {e}")
+                continue
+            except OSError:
+                if self._closed:
+                    break
+                raise
+            threading.Thread(target=self._serve_connection, args=(conn,), name='engine-service-client', daemon=True).start()
+
+    def close(self):
+        self._closed = True
+        if self._listener is not None:
+            self._listener.close()
+        self.pool.close()
+
+
+# Stand-in for a borrowed engine: every search is sent to the engine service
+class RemoteEngine:
+    def __init__(self, pool, options, timeout, priority):
+        self.pool = pool
+        self.options = options
+        self.timeout = timeout
+        self.priority = priority
+
+    def _search(self, op, board, limit, game, **extra):
+        return self.pool._call(dict(op=op, board=board, limit=limit, game=game, options=self.options,
+                                    timeout=self.timeout, priority=self.priority, **extra))
+
+    def play(self, board, limit, *, info=chess.engine.INFO_NONE, game=None):
+        return self._search('play', board, limit, game, info=info)
+
+    def analyse(self, board, limit, *, game=None):
+        return self._search('analyse', board, limit, game)
+
+    def play_until_stable(self, board, limit, stable_depths, min_depth=0, game=None):
+        return self._search('play', board, limit, game, stable=(stable_depths, min_depth))
+
+    def play_with_lines(self, board, limit, game=None):
+        return self._search('play', board, limit, game, lines=True)
+
+
+# Drop-in replacement for EnginePool in web workers that share an EngineService. Checkouts
+# reserve nothing locally: the service queues each search by priority against its own fleet.
+class RemoteEnginePool:
+    def __init__(self, address=DEFAULT_ADDRESS, authkey=None, default_options=None, reply_timeout=60.0):
+        self.address = address
+        self.authkey = _authkey_bytes(authkey)
+        self.default_options = dict(default_options or {})
+        self.reply_timeout = reply_timeout
+        self._lock = threading.Lock()
+        self._connections = []
+        self._closed = False
+
+    def _call(self, request, timeout=None):
+        # Each connection carries one request at a time; idle ones are reused by the next caller
+        with self._lock:
+            if self._closed:
+                raise EngineUnavailableError("Engine pool is closed")
+            conn = self._connections.pop() if self._connections else None
+        if conn is None:
+            try:
+                conn = Client(self.address, family='AF_UNIX', authkey=self.authkey)
+            except (OSError, EOFError, AuthenticationError) as e:
+                raise EngineUnavailableError(f"Engine service at {self.address} is unreachable: {e}")
+        try:
+            conn.send(request)
+            if not conn.poll((timeout if timeout is not None else request.get('timeout', 0)) + self.reply_timeout):
+                raise TimeoutError("no reply")
+            response = conn.recv()
+        except (OSError, EOFError) as e:
+            conn.close()
+            raise EngineUnavailableError(f"Lost the engine service at {self.address}: {e}")
+        with self._lock:
+            self._connections.append(conn)
+        if response['ok']:
+            return response['result']
+        if response['kind'] == 'busy':
+            raise EngineBusyError(response['error'])
+        if response['kind'] == 'unavailable':
+            raise EngineUnavailableError(response['error'])
+        raise chess.engine.EngineError(response['error'])
+
+    @contextmanager
+    def checkout(self, options=None, timeout=30.0, priority=PRIORITY_MOVE):
+        yield RemoteEngine(self, {**self.default_options, **(options or {})}, timeout, priority)
+
+    def saturated(self):
+        return self._call({'op': 'saturated'})
+
+    def ping(self):
+        try:
+            return tuple(self._call({'op': 'ping'}))
+        except EngineUnavailableError as e:
+            return False, str(e)
+
+    def stats(self):
+        return self._call({'op': 'stats'})
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run one Stockfish fleet shared by every web worker on this host')
+    parser.add_argument('--socket', default=os.environ.get('ENGINE_SERVICE', DEFAULT_ADDRESS))
+    parser.add_argument('--engine', default=os.environ.get('STOCKFISH_PATH', "./stockfish.exe" if os.name == 'nt' else "./stockfish"))
+    parser.add_argument('--engines', type=int, default=os.cpu_count() or 2, help='engine processes (default: CPU cores)')
+    parser.add_argument('--queue-limit', type=int, default=64, help='searches allowed to wait for an engine')
+    parser.add_argument('--authkey-file', help='where the key is kept when ENGINE_SERVICE_AUTHKEY is not set '
+                                               '(default: the socket path plus .key; created if missing)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='[%(asctime)s] %(levelname)s in %(module)s: %(message)s')
+    authkey = os.environ.get('ENGINE_SERVICE_AUTHKEY')
+    if not authkey:
+        key_file = args.authkey_file or authkey_path(args.socket)
+        authkey = load_authkey(key_file, create=True)
+        logger.info(f"Engine service key is in {key_file}")
+    pool = EnginePool(args.engine, size=args.engines, max_waiting=args.queue_limit)
+    service = EngineService(pool, args.socket, authkey)
+    # python-chess engine threads are not daemons; close the fleet before the interpreter joins them
+    getattr(threading, '_register_atexit', atexit.register)(pool.close)
+    signal.signal(signal.SIGTERM, lambda signum, frame: service.close())
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,154 @@
+import chess
+import chess.engine
+import chess.polyglot
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+def _to_signed(key):
+    # SQLite integers are signed 64-bit, Zobrist hashes are unsigned
+    return key - (1 << 64) if key >= (1 << 63) else key
+
+
+# One analysed position; the score is stored relative to the side to move
+class CachedEval:
+    __slots__ = ('turn', 'cp', 'mate', 'pv', 'depth', 'stored_at')
+
+    def __init__(self, turn, cp, mate, pv, depth, stored_at=None):
+        self.turn = turn
+        self.cp = cp
+        self.mate = mate
+        self.pv = pv
+        self.depth = depth
+        self.stored_at = stored_at if stored_at is not None else time.time()
+
+    @property
+    def score(self):
+        relative = chess.engine.Mate(self.mate) if self.mate is not None else chess.engine.Cp(self.cp or 0)
+        return chess.engine.PovScore(relative, self.turn)
+
+    @property
+    def best_move(self):
+        return self.pv[0] if self.pv else None
+
+
+# LRU/TTL cache of engine analysis shared by every game in the process
+class EvalCache:
+    def __init__(self, max_entries=100000, ttl=86400, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # The SQLite connection has its own lock, so lookups in memory never wait on disk
+        self._db_lock = threading.Lock()
+        self._db = None
+        self.hits = 0
+        self.misses = 0
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute('''CREATE TABLE IF NOT EXISTS eval_cache (
+                zobrist INTEGER PRIMARY KEY,
+                cp INTEGER,
+                mate INTEGER,
+                pv TEXT NOT NULL,
+                depth INTEGER NOT NULL,
+                stored_at REAL NOT NULL
+            )''')
+            self._db.commit()
+
+    def _expired(self, entry):
+        return self.ttl and time.time() - entry.stored_at > self.ttl
+
+    def _load(self, key, turn):
+        with self._db_lock:
+            if self._db is None:
+                return None
+            row = self._db.execute('SELECT cp, mate, pv, depth, stored_at FROM eval_cache WHERE zobrist = ?',
+                                   (_to_signed(key),)).fetchone()
+        if row is None:
+            return None
+        return CachedEval(turn, row[0], row[1], row[2].split(), row[3], row[4])
+
+    def get(self, board, min_depth=0, allow_stale=False):
+        """Return the cached analysis of ``board`` or None on a miss; ``allow_stale`` ignores the TTL."""
+        key = chess.polyglot.zobrist_hash(board)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None or self._db is None:
+                return self._result(key, entry, min_depth, allow_stale)
+        # Read through to SQLite without holding the cache lock
+        loaded = self._load(key, board.turn)
+        with self._lock:
+            entry = self._entries.get(key)  # A put() while we read wins
+            if entry is None and loaded is not None:
+                entry = loaded
+                self._store(key, entry)
+            return self._result(key, entry, min_depth, allow_stale)
+
+    def _result(self, key, entry, min_depth, allow_stale):
+        if entry is None or (self._expired(entry) and not allow_stale) or entry.depth < min_depth:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    def put(self, board, info):
+        """Store an engine ``InfoDict`` for ``board``; a shallower result never replaces a deeper one."""
+        score = info.get('score')
+        if score is None:
+            return None
+        relative = score.pov(board.turn)
+        pv = [move.uci() for move in info.get('pv', [])]
+        entry = CachedEval(board.turn, relative.score(), relative.mate(), pv, info.get('depth', 0))
+        if not pv:
+            # Terminal positions have nothing worth caching
+            return entry
+        key = chess.polyglot.zobrist_hash(board)
+        with self._lock:
+            current = self._entries.get(key)
+            if current is not None and current.depth > entry.depth and not self._expired(current):
+                return current
+            self._store(key, entry)
+        if self._db is not None:
+            self._persist(key, entry)
+        return entry
+
+    def _persist(self, key, entry):
+        # Concurrent writers of one position may commit in either order: the depth check keeps the deeper one
+        with self._db_lock:
+            if self._db is None:
+                return
+            try:
+                self._db.execute('''INSERT INTO eval_cache (zobrist, cp, mate, pv, depth, stored_at) VALUES (?, ?, ?, ?, ?, ?)
+                                    ON CONFLICT(zobrist) DO UPDATE SET cp = excluded.cp, mate = excluded.mate, pv = excluded.pv,
+                                    depth = excluded.depth, stored_at = excluded.stored_at
+                                    WHERE excluded.depth >= eval_cache.depth''',
+                                 (_to_signed(key), entry.cp, entry.mate, ' '.join(entry.pv), entry.depth, entry.stored_at))
+                self._db.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Failed to persist evaluation: {e}")
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses,
+                    'hit_rate': self.hits / lookups if lookups else 0.0}
+
+    def close(self):
+        with self._db_lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
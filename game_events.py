@@ -0,0 +1,97 @@
+import itertools
+import secrets
+import threading
+import time
+from collections import deque
+
+
+class _Channel:
+    __slots__ = ('events', 'listeners', 'touched', 'changed')
+
+    def __init__(self, lock, buffer_size):
+        self.events = deque(maxlen=buffer_size)
+        self.listeners = 0
+        self.touched = time.time()
+        self.changed = threading.Condition(lock)
+
+
+# Per-game publish/subscribe for the server-push stream. Each game keeps its last few events so
+# a client that reconnects with the last event id it saw misses nothing. Listeners block on a
+# per-game condition, which gevent/eventlet workers turn into a cooperative wait, and only the
+# listeners of the game that changed are woken. Event ids carry a per-process epoch, so an id
+# handed out before a restart (or by another worker) is recognised as foreign, not compared.
+class GameEvents:
+    def __init__(self, buffer_size=32, retention=600, max_listeners=1000):
+        self.buffer_size = buffer_size
+        self.retention = retention
+        self.max_listeners = max_listeners
+        self._lock = threading.Lock()
+        self._channels = {}
+        self._ids = itertools.count(1)
+        self.epoch = secrets.token_hex(4)
+        self._listeners = 0
+        self.published = 0
+
+    def _channel(self, game_id):
+        channel = self._channels.get(game_id)
+        if channel is None:
+            now = time.time()
+            for stale_id in [k for k, c in self._channels.items()
+                             if not c.listeners and now - c.touched > self.retention]:
+                del self._channels[stale_id]
+            channel = self._channels[game_id] = _Channel(self._lock, self.buffer_size)
+        return channel
+
+    def publish(self, game_id, event, data):
+        with self._lock:
+            channel = self._channel(game_id)
+            channel.events.append((next(self._ids), event, data))
+            channel.touched = time.time()
+            self.published += 1
+            channel.changed.notify_all()
+
+    def subscribe(self, game_id):
+        """Register a listener; returns the sequence number of the game's latest event, or None
+        when the process already has ``max_listeners`` listeners."""
+        with self._lock:
+            if self._listeners >= self.max_listeners:
+                return None
+            channel = self._channel(game_id)
+            channel.listeners += 1
+            self._listeners += 1
+            return channel.events[-1][0] if channel.events else 0
+
+    def unsubscribe(self, game_id):
+        with self._lock:
+            channel = self._channels.get(game_id)
+            if channel is not None:
+                channel.listeners -= 1
+                channel.touched = time.time()
+            self._listeners -= 1
+
+    def event_id(self, seq):
+        return f"{self.epoch}-{seq}"
+
+    def sequence(self, event_id):
+        """The sequence number of an id from ``event_id``, or None if it is missing, malformed or
+        from another epoch."""
+        epoch, _, seq = (event_id or '').partition('-')
+        if epoch != self.epoch or not seq.isdigit():
+            return None
+        return int(seq)
+
+    def wait(self, game_id, after, timeout):
+        """Events published after sequence number ``after``, waiting up to ``timeout`` seconds for one."""
+        with self._lock:
+            channel = self._channel(game_id)
+            channel.changed.wait_for(lambda: channel.events and channel.events[-1][0] > after, timeout)
+            return [entry for entry in channel.events if entry[0] > after]
+
+    def listening(self, game_id):
+        with self._lock:
+            channel = self._channels.get(game_id)
+            return channel is not None and channel.listeners > 0
+
+    def stats(self):
+        with self._lock:
+            return {'channels': len(self._channels), 'listeners': self._listeners, 'published': self.published}
@@ -0,0 +1,83 @@
+import math
+
+import chess
+
+from eval_cache import CachedEval
+
+# Drops in the mover's winning chances (in percentage points) that make a move an
+# inaccuracy, a mistake or a blunder, checked from the largest down; the last field is
+# the key counting them in the summary
+CLASSIFICATIONS = (('blunder', 15.0, 'blunders'), ('mistake', 10.0, 'mistakes'), ('inaccuracy', 5.0, 'inaccuracies'))
+
+
+def terminal_eval(board):
+    """Evaluation of a finished position (mated or drawn), or None while play goes on."""
+    if board.is_checkmate():
+        return CachedEval(board.turn, None, 0, [], 0)
+    if board.is_game_over():
+        return CachedEval(board.turn, 0, None, [], 0)
+    return None
+
+
+def winning_chances(score, color):
+    """Expected result for ``color`` in percent, on the logistic curve Lichess fits to its games."""
+    pov = score.pov(color)
+    if pov.is_mate():
+        return 100.0 if pov.score(mate_score=100000) > 0 else 0.0
+    cp = max(-1000, min(1000, pov.score()))
+    return 50 + 50 * (2 / (1 + math.exp(-0.00368208 * cp)) - 1)
+
+
+def move_accuracy(win_before, win_after):
+    # Lichess' per-move accuracy: 100 for a move that keeps every winning chance, falling off
+    # exponentially with the chances given away
+    loss = max(0.0, win_before - win_after)
+    return max(0.0, min(100.0, 103.1668 * math.exp(-0.04354 * loss) - 3.1669))
+
+
+def classify(loss):
+    for name, threshold, _ in CLASSIFICATIONS:
+        if loss >= threshold:
+            return name
+    return None
+
+
+def score_json(score):
+    """A score from White's point of view as ``{'cp': ..., 'mate': ...}``."""
+    white = score.white()
+    return {'cp': white.score(), 'mate': white.mate()}
+
+
+def review_move(board, move, before, after):
+    """Describe ``move`` played on ``board``, given the position's evaluation ``before`` it (a
+    CachedEval) and ``after`` it; ``board`` is left unchanged."""
+    color = board.turn
+    win_before = winning_chances(before.score, color)
+    win_after = winning_chances(after.score, color)
+    loss = max(0.0, win_before - win_after)
+    return {
+        'ply': board.ply() + 1,
+        'color': 'White' if color == chess.WHITE else 'Black',
+        'move': move.uci(),
+        'san': board.san(move),
+        'best': before.best_move,
+        'eval': score_json(after.score),
+        'depth': after.depth,
+        'win_before': round(win_before, 1),
+        'win_after': round(win_after, 1),
+        'accuracy': round(move_accuracy(win_before, win_after), 1),
+        'classification': None if move.uci() == before.best_move else classify(loss),
+    }
+
+
+def summarize(plies):
+    """Per-side accuracy (mean of move accuracies) and counts of each classification."""
+    summary = {}
+    for color in ('White', 'Black'):
+        moves = [ply for ply in plies if ply['color'] == color]
+        side = {'moves': len(moves),
+                'accuracy': round(sum(ply['accuracy'] for ply in moves) / len(moves), 1) if moves else None}
+        for name, _, total in CLASSIFICATIONS:
+            side[total] = sum(1 for ply in moves if ply['classification'] == name)
+        summary[color] = side
+    return summary
@@ -0,0 +1,136 @@
+import copy
+import json
+import logging
+import queue
+import random
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+# Attributes every LogRecord has; anything else on a record came from ``extra`` or a filter
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime'}
+
+
+# Defers an expensive value (e.g. ``board.fen``) until a record is actually formatted, so
+# records that are sampled out or below the level never pay for it
+class Lazy:
+    __slots__ = ('func', 'args')
+
+    def __init__(self, func, *args):
+        self.func = func
+        self.args = args
+
+    def __str__(self):
+        return str(self.func(*self.args))
+
+
+# One JSON object per line: timestamp, level, logger (category), message and context ids
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_FIELDS and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+# Stamps records with ids from the thread that logged them (e.g. the current request and game)
+class ContextFilter(logging.Filter):
+    def __init__(self, context):
+        super().__init__()
+        self.context = context
+
+    def filter(self, record):
+        for key, value in self.context().items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+# Keeps a fraction of a category's records; warnings and errors always pass
+class SamplingFilter(logging.Filter):
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+        self._random = random.Random()
+
+    def filter(self, record):
+        return record.levelno >= logging.WARNING or self._random.random() < self.rate
+
+
+# Hands records to the background writer; when the queue is full the record is dropped (and
+# counted) rather than making the request thread wait for disk
+class DroppingQueueHandler(QueueHandler):
+    def __init__(self, log_queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def emit(self, record):
+        # A full queue drops the record anyway, so check before paying for prepare()
+        if self.queue.full():
+            self._drop()
+            return
+        super().emit(record)
+
+    def prepare(self, record):
+        # Runs on the thread that logged (usually a request thread), so the message is rendered
+        # there with its arguments as they are now; the writer thread only formats the JSON line
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self._drop()  # Filled up since emit() checked
+
+    def _drop(self):
+        with self._lock:
+            self.dropped += 1
+
+
+def parse_settings(text, convert):
+    """Parse ``"app.moves=0.1,engine_pool=WARNING"`` into ``{'app.moves': convert('0.1'), ...}``."""
+    settings = {}
+    for part in (text or '').split(','):
+        name, sep, value = part.partition('=')
+        if sep and name.strip():
+            settings[name.strip()] = convert(value.strip())
+    return settings
+
+
+def start_logging(loggers, path, level=logging.INFO, levels=None, sample_rates=None, queue_size=10000,
+                  max_bytes=1000000, backup_count=5, console_handler=None, context=None):
+    """Route ``loggers`` through a queue to a JSON file (and optionally the console) written
+    by a background thread. Returns ``(queue_handler, listener)``; stop the listener at exit."""
+    file_handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+    file_handler.setFormatter(JsonFormatter())
+    handlers = [file_handler] + ([console_handler] if console_handler is not None else [])
+    queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+    if context is not None:
+        queue_handler.addFilter(ContextFilter(context))
+    for logger in loggers:
+        logger.addHandler(queue_handler)
+        logger.setLevel(level)
+    for name, category_level in (levels or {}).items():
+        logging.getLogger(name).setLevel(category_level)
+    for name, rate in (sample_rates or {}).items():
+        logging.getLogger(name).addFilter(SamplingFilter(rate))
+    listener = QueueListener(queue_handler.queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return queue_handler, listener
@@ -0,0 +1,145 @@
+import chess
+import chess.polyglot
+import chess.syzygy
+import logging
+import os
+import random
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Centipawn score reported for tablebase wins, matching the range engines use for TB results
+TABLEBASE_WIN_CP = 20000
+
+
+class SourceStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def record(self, hit):
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def as_dict(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+
+# Polyglot opening book; how a move is picked from the book depends on the difficulty
+class OpeningBook:
+    def __init__(self, path, max_ply=30):
+        self.path = path
+        self.max_ply = max_ply
+        self.stats = SourceStats()
+        self._readers = []
+        self._random = random.Random()
+        paths = [path]
+        if os.path.isdir(path):
+            paths = sorted(os.path.join(path, name) for name in os.listdir(path) if name.endswith('.bin'))
+        for book_path in paths:
+            try:
+                self._readers.append(chess.polyglot.open_reader(book_path))
+                logger.info(f"Opened opening book {book_path}")
+            except OSError as e:
+                logger.error(f"Failed to open opening book {book_path}: {e}")
+
+    def move(self, board, difficulty):
+        """Return a book move for ``board`` or None if the position is out of book."""
+        if not self._readers or board.ply() > self.max_ply:
+            return None
+        # The readers are given the board, not its Zobrist key: only with the board can they turn
+        # Polyglot's king-takes-rook castling (e1h1) into the standard move (e1g1)
+        for reader in self._readers:
+            try:
+                if difficulty == 'Hard':
+                    entry = reader.find(board)
+                elif difficulty == 'Easy':
+                    entry = reader.choice(board, random=self._random)
+                else:
+                    entry = reader.weighted_choice(board, random=self._random)
+            except IndexError:
+                continue
+            move = entry.move
+            if board.is_legal(move):
+                self.stats.record(True)
+                return move
+        self.stats.record(False)
+        return None
+
+    def close(self):
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
+
+
+# Syzygy endgame tablebases: exact results for positions with few pieces left
+class Tablebase:
+    def __init__(self, directory):
+        self.directory = directory
+        self.stats = SourceStats()
+        self._random = random.Random()
+        self._tablebase = None
+        try:
+            self._tablebase = chess.syzygy.open_tablebase(directory)
+            self.max_pieces = max((len(os.path.splitext(name)[0]) - 1 for name in os.listdir(directory) if name.endswith('.rtbw')), default=0)
+            logger.info(f"Opened Syzygy tablebases in {directory} (up to {self.max_pieces} pieces)")
+        except OSError as e:
+            logger.error(f"Failed to open Syzygy tablebases in {directory}: {e}")
+            self.max_pieces = 0
+
+    def _covers(self, board):
+        return self._tablebase is not None and chess.popcount(board.occupied) <= self.max_pieces and not board.castling_rights
+
+    def probe_wdl(self, board):
+        """Win/draw/loss from the side to move's point of view (2, 0, -2, or +-1 for cursed results), or None."""
+        if not self._covers(board):
+            return None
+        try:
+            wdl = self._tablebase.probe_wdl(board)
+        except (KeyError, chess.syzygy.MissingTableError):
+            self.stats.record(False)
+            return None
+        self.stats.record(True)
+        return wdl
+
+    def move(self, board, difficulty):
+        """Return a tablebase move for ``board`` or None if the position is not covered."""
+        if not self._covers(board):
+            return None
+        board = board.copy(stack=False)
+        scored = []
+        try:
+            for move in board.legal_moves:
+                board.push(move)
+                try:
+                    wdl = -self._tablebase.probe_wdl(board)
+                    dtz = self._tablebase.probe_dtz(board)
+                finally:
+                    board.pop()
+                # Win quickly (opponent's DTZ closest to zero), lose as slowly as possible
+                scored.append((wdl, -abs(dtz) if wdl > 0 else abs(dtz), move))
+        except (KeyError, chess.syzygy.MissingTableError):
+            self.stats.record(False)
+            return None
+        if not scored:
+            return None
+        self.stats.record(True)
+        best_wdl = max(wdl for wdl, _, _ in scored)
+        if difficulty == 'Easy':
+            # Any move that does not turn the position into a loss
+            candidates = [move for wdl, _, move in scored if wdl >= min(best_wdl, 0)]
+        elif difficulty == 'Medium':
+            candidates = [move for wdl, _, move in scored if wdl == best_wdl]
+        else:
+            candidates = [max(scored, key=lambda item: item[:2])[2]]
+        return self._random.choice(candidates)
+
+    def close(self):
+        if self._tablebase is not None:
+            self._tablebase.close()
+            self._tablebase = None
@@ -0,0 +1,65 @@
+import chess
+import chess.pgn
+
+
+# Collects just what the move log needs from one PGN game (tags, main-line moves and the final
+# position) without building a tree of GameNodes; side variations are skipped unparsed
+class _MainLineReader(chess.pgn.BaseVisitor):
+    def begin_game(self):
+        self.headers = {}
+        self.moves = []
+        self.board = None
+        self.error = None
+
+    def visit_header(self, tagname, tagvalue):
+        self.headers[tagname] = tagvalue
+
+    def end_headers(self):
+        # The move log always replays from the standard starting position
+        if 'FEN' in self.headers or self.headers.get('Variant', 'Standard').lower() not in ('standard', 'chess'):
+            self.error = 'not played from the standard starting position'
+            return chess.pgn.SKIP
+        return None
+
+    def visit_board(self, board):
+        if self.board is None:
+            self.board = board  # The main-line board; moves are pushed onto it in place
+
+    def begin_variation(self):
+        return chess.pgn.SKIP
+
+    def visit_move(self, board, move):
+        self.moves.append(move)
+
+    def handle_error(self, error):
+        self.error = self.error or str(error)
+
+    def result(self):
+        return self.headers, self.moves, self.board, self.error
+
+
+def read_games(handle):
+    """Yield ``(headers, moves, board, error)`` for each game in a PGN text stream, one game at a
+    time; ``error`` is None for games that can be stored."""
+    while True:
+        game = chess.pgn.read_game(handle, Visitor=_MainLineReader)
+        if game is None:
+            return
+        yield game
+
+
+def game_pgn(headers, moves):
+    """PGN text of a game played from the standard starting position, given its tag pairs and
+    its moves in UCI notation, followed by the blank line that separates games. Raises ValueError
+    on an illegal move, which the exporter would otherwise write out as nonsense."""
+    game = chess.pgn.Game()
+    game.headers.update(headers)
+    board = chess.Board()
+    node = game
+    for uci in moves:
+        move = chess.Move.from_uci(uci)
+        if not board.is_legal(move):
+            raise ValueError(f"illegal move {uci} in {board.fen()}")
+        board.push(move)
+        node = node.add_main_variation(move)
+    return game.accept(chess.pgn.StringExporter()) + "\n\n"
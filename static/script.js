@@ -7,14 +7,24 @@ let username = localStorage.getItem('username') || null;
 let selectedSquare = null;
 let useTapToMove = /Mobi|Android/i.test(navigator.userAgent); // Default to tap-to-move on mobile
 
+// --- Asset setup ---
+// ASSET_URLS is defined at the top of the asset bundle: hashed sound URLs, and the piece
+// images inlined as data URIs so the board needs no image requests
+const pieceTheme = piece => ASSET_URLS.pieces[piece];
+
 // --- Sound setup ---
-const moveSound = new Audio('/static/move.wav');
-const captureSound = new Audio('/static/capture.wav');
-const checkSound = new Audio('/static/check.wav');
+const moveSound = new Audio(ASSET_URLS['move.wav']);
+const captureSound = new Audio(ASSET_URLS['capture.wav']);
+const checkSound = new Audio(ASSET_URLS['check.wav']);
 
 // --- Move navigation state ---
 let fullMoveHistory = [];
 let navMoveIndex = -1; // -1 means latest position
+let gameStateEtag = null; // ETag of the last /fen response, sent back so unchanged polls get a 304
+
+// --- Server push state ---
+let gameEvents = null; // EventSource for the current game's /events stream
+let readyHint = null; // { ply, hint } pushed by the server for the position the player faces
 
 // --- Timer setup ---
 let whiteTime = 300; // default 5 min
@@ -43,7 +53,7 @@ function initializeBoard() {
         onMouseoverSquare: onMouseoverSquare,
         onMouseoutSquare: onMouseoutSquare,
         onSquareClick: onSquareClick,
-        pieceTheme: '/static/img/chesspieces/wikipedia/{piece}.png',
+        pieceTheme: pieceTheme,
         orientation: playerColor.toLowerCase()
     });
 
@@ -374,7 +384,7 @@ $(document).ready(function() {
             onMouseoverSquare: onMouseoverSquare,
             onMouseoutSquare: onMouseoutSquare,
             onSquareClick: onSquareClick,
-            pieceTheme: '/static/img/chesspieces/wikipedia/{piece}.png',
+            pieceTheme: pieceTheme,
             orientation: playerColor.toLowerCase()
         });
         updateInteractionModeUI();
@@ -383,24 +393,12 @@ $(document).ready(function() {
 
     $('#hint-button').on('click', function() {
         console.log("Hint button clicked");
+        if (readyHint && readyHint.ply === fullMoveHistory.length) {
+            showHint({ hint: readyHint.hint });
+            return;
+        }
         toggleButtonSpinner('hint-button', true);
-        $.get('/hint', function(data) {
-            console.log("Hint response:", data);
-            const $hint = $('#hint');
-            if (data.hint) {
-                const fromSquare = data.hint.slice(0, 2);
-                const toSquare = data.hint.slice(2, 4);
-                drawHintArrow(fromSquare, toSquare);
-                $hint.text(`Hint: ${data.hint}`).removeClass('hidden');
-                setTimeout(() => {
-                    clearHintArrow();
-                    $hint.addClass('hidden');
-                }, 5000);
-            } else {
-                $hint.text(data.message || 'No hint available').removeClass('hidden');
-                setTimeout(() => $hint.addClass('hidden'), 5000);
-            }
-        }).fail(function(xhr, status, error) {
+        $.get('/hint', showHint).fail(function(xhr, status, error) {
             console.error("Failed to fetch hint:", status, error);
             showToast("Failed to fetch hint", "error");
         }).always(function() {
@@ -432,6 +430,12 @@ $(document).ready(function() {
     $('#save-button').on('click', saveGame);
     $('#resume-button').on('click', showResumeModal);
     $('#load-game-button').on('click', resumeGame);
+    $('#game-list').on('change', function() {
+        const $more = $(this).find('option[value="more"]:selected');
+        if ($more.length) {
+            loadGamePage($more.attr('data-cursor'));
+        }
+    });
     $('#logout-button').on('click', logout);
 
     $(document).on('click', '#prev-move', function() {
@@ -452,23 +456,112 @@ $(document).ready(function() {
     }, 1000);
 });
 
-function fetchFen() {
-    $.get('/fen', function(data) {
-        console.log("Fetched FEN response:", data);
-        playerColor = data.player_color;
-        currentGameId = data.game_id;
-        board.orientation(playerColor.toLowerCase());
+function showHint(data) {
+    console.log("Hint response:", data);
+    const $hint = $('#hint');
+    if (data.hint) {
+        const fromSquare = data.hint.slice(0, 2);
+        const toSquare = data.hint.slice(2, 4);
+        drawHintArrow(fromSquare, toSquare);
+        $hint.text(`Hint: ${data.hint}`).removeClass('hidden');
+        setTimeout(() => {
+            clearHintArrow();
+            $hint.addClass('hidden');
+        }, 5000);
+    } else {
+        $hint.text(data.message || 'No hint available').removeClass('hidden');
+        setTimeout(() => $hint.addClass('hidden'), 5000);
+    }
+}
+
+// Follow the current game's server-push stream: the AI move as soon as it is chosen, then
+// evaluations refined depth by depth and the hint for the position the player faces
+function subscribeGameEvents() {
+    if (typeof EventSource === 'undefined' || currentGameId === null) {
+        return;
+    }
+    if (gameEvents && gameEvents.gameId === currentGameId) {
+        return;
+    }
+    if (gameEvents) {
+        gameEvents.close();
+    }
+    readyHint = null;
+    gameEvents = new EventSource(`/events/${currentGameId}`);
+    gameEvents.gameId = currentGameId;
+    gameEvents.addEventListener('move', function(e) {
+        const data = JSON.parse(e.data);
+        // Only a reply to the position we show; anything else arrives with the next response
+        if (data.game_id !== currentGameId || data.ply !== fullMoveHistory.length + 1 || data.result) {
+            return;
+        }
+        console.log("Pushed AI move:", data);
         board.position(data.fen);
         game.load(data.fen);
-        updateProbability(data.probability);
-        updateHistory(data.history);
+        updateHistory(fullMoveHistory.concat([data.move]));
+        if (data.probability !== null) {
+            updateProbability(data.probability);
+        }
         updateStatus();
-    }).fail(function(xhr, status, error) {
-        console.error("Failed to fetch FEN:", status, error);
-        if (xhr.status === 401) {
-            window.location.href = '/login';
-        } else {
-            showToast("Failed to load game state", "error");
+    });
+    gameEvents.addEventListener('eval', function(e) {
+        const data = JSON.parse(e.data);
+        if (data.ply === fullMoveHistory.length) {
+            updateProbability(data.probability);
+        }
+    });
+    gameEvents.addEventListener('hint', function(e) {
+        readyHint = JSON.parse(e.data);
+    });
+}
+
+// Ask only for the plies after the ones we already hold for the current game
+function historyParams() {
+    return currentGameId === null ? {} : { game_id: currentGameId, since_ply: fullMoveHistory.length };
+}
+
+// Responses to historyParams() requests carry either the full history or just the new plies
+function responseHistory(response) {
+    if (response.moves === undefined) {
+        return response.history;
+    }
+    return fullMoveHistory.slice(0, response.since_ply).concat(response.moves);
+}
+
+function fetchFen() {
+    $.ajax({
+        url: '/fen',
+        type: 'GET',
+        data: historyParams(),
+        headers: gameStateEtag ? { 'If-None-Match': gameStateEtag } : {},
+        success: function(data, status, xhr) {
+            if (xhr.status === 304) {
+                console.log("Game state unchanged");
+                return;
+            }
+            console.log("Fetched FEN response:", data);
+            gameStateEtag = xhr.getResponseHeader('ETag');
+            playerColor = data.player_color;
+            currentGameId = data.game_id;
+            subscribeGameEvents();
+            board.orientation(playerColor.toLowerCase());
+            board.position(data.fen);
+            game.load(data.fen);
+            updateProbability(data.probability);
+            updateHistory(responseHistory(data));
+            updateStatus();
+            // The AI is to move: collect its reply (the server restarts it if it was lost)
+            if (data.job_id) {
+                waitForAiMove(data.job_id);
+            }
+        },
+        error: function(xhr, status, error) {
+            console.error("Failed to fetch FEN:", status, error);
+            if (xhr.status === 401) {
+                window.location.href = '/login';
+            } else {
+                showToast("Failed to load game state", "error");
+            }
         }
     });
 }
@@ -524,61 +617,20 @@ function makeServerMove(moveString) {
         url: '/move',
         type: 'POST',
         contentType: 'application/json',
-        data: JSON.stringify({ move: moveString, difficulty: $('#difficulty').val(), player_color: playerColor }),
+        data: JSON.stringify({ move: moveString, difficulty: $('#difficulty').val(), player_color: playerColor, async: true, ...historyParams() }),
         success: function(response) {
             console.log("Move response:", response);
-            if (response.error) {
-                console.warn("Move error:", response.error);
-                game.undo();
-                board.position(game.fen());
-                showToast(response.error, "error");
+            if (response.pending) {
+                // Show our own move right away; the AI reply arrives from /move_result
+                updateHistory(responseHistory(response));
+                updateStatus();
+                $('#hint').addClass('hidden');
+                clearHintArrow();
+                waitForAiMove(response.job_id);
             } else {
-                playerColor = response.player_color;
-                currentGameId = response.game_id;
-                board.orientation(playerColor.toLowerCase());
-                board.position(response.fen);
-                game.load(response.fen);
-                // Update probability if the game is not over
-                if (!response.result) {
-                    updateProbability(response.probability);
-                }
-                updateHistory(response.history);
-                // Handle game over
-                if (response.result) {
-                    let resultMessage;
-                    if (
-                        (response.result === "1-0" && playerColor === "White") ||
-                        (response.result === "0-1" && playerColor === "Black")
-                    ) {
-                        resultMessage = "You win!";
-                    } else if (response.result === "1/2-1/2") {
-                        resultMessage = "Draw!";
-                    } else {
-                        resultMessage = "You lose!";
-                    }
-                    $('#probability').text(resultMessage);
-                    $('.probability-fill').css('width', '0%');
-                    showToast(resultMessage, "info");
-                    // Disable further moves
-                    board = Chessboard('board', {
-                        draggable: !useTapToMove,
-                        position: game.fen(),
-                        onDrop: onDrop,
-                        onSnapEnd: onSnapEnd,
-                        onDragStart: onDragStart,
-                        onMouseoverSquare: onMouseoverSquare,
-                        onMouseoutSquare: onMouseoutSquare,
-                        onSquareClick: onSquareClick,
-                        pieceTheme: '/static/img/chesspieces/wikipedia/{piece}.png',
-                        orientation: playerColor.toLowerCase()
-                    });
-                    $('#hint-button').prop('disabled', true);
-                }
+                applyMoveResponse(response);
+                toggleButtonSpinner('reset-button', false);
             }
-            updateStatus();
-            $('#hint').addClass('hidden');
-            clearHintArrow();
-            setTimeout(afterMoveSwitchTimer, 500);
         },
         error: function(xhr, status, error) {
             console.error("Move request failed:", status, error);
@@ -587,15 +639,99 @@ function makeServerMove(moveString) {
             } else {
                 game.undo();
                 board.position(game.fen());
-                showToast("Failed to make move", "error");
+                showToast(xhr.status === 409 ? "AI is still thinking" : "Failed to make move", "error");
+            }
+            toggleButtonSpinner('reset-button', false);
+        }
+    });
+}
+
+// Long-poll for the AI reply to a move queued with async: true
+function waitForAiMove(jobId) {
+    $.ajax({
+        url: `/move_result/${jobId}?wait=10`,
+        type: 'GET',
+        data: historyParams(),
+        success: function(response, status, xhr) {
+            if (xhr.status === 202) {
+                waitForAiMove(jobId);
+                return;
             }
+            console.log("AI move response:", response);
+            applyMoveResponse(response);
+            toggleButtonSpinner('reset-button', false);
         },
-        complete: function() {
+        error: function(xhr, status, error) {
+            console.error("AI move request failed:", status, error);
+            if (xhr.status === 401) {
+                window.location.href = '/login';
+            } else {
+                showToast("Failed to get AI move", "error");
+                // Reload the game after a pause: the player's move has been taken back, or the
+                // AI's reply is restarted, and an engine outage should not be hammered
+                setTimeout(fetchFen, (parseInt(xhr.getResponseHeader('Retry-After'), 10) || 2) * 1000);
+            }
             toggleButtonSpinner('reset-button', false);
         }
     });
 }
 
+function applyMoveResponse(response) {
+    if (response.error) {
+        console.warn("Move error:", response.error);
+        game.undo();
+        board.position(game.fen());
+        showToast(response.error, "error");
+    } else {
+        playerColor = response.player_color;
+        currentGameId = response.game_id;
+        subscribeGameEvents();
+        board.orientation(playerColor.toLowerCase());
+        board.position(response.fen);
+        game.load(response.fen);
+        // Update probability if the game is not over
+        if (!response.result) {
+            updateProbability(response.probability);
+        }
+        updateHistory(responseHistory(response));
+        // Handle game over
+        if (response.result) {
+            let resultMessage;
+            if (
+                (response.result === "1-0" && playerColor === "White") ||
+                (response.result === "0-1" && playerColor === "Black")
+            ) {
+                resultMessage = "You win!";
+            } else if (response.result === "1/2-1/2") {
+                resultMessage = "Draw!";
+            } else {
+                resultMessage = "You lose!";
+            }
+            $('#probability').text(resultMessage);
+            $('.probability-fill').css('width', '0%');
+            showToast(resultMessage, "info");
+            // Disable further moves
+            board = Chessboard('board', {
+                draggable: !useTapToMove,
+                position: game.fen(),
+                onDrop: onDrop,
+                onSnapEnd: onSnapEnd,
+                onDragStart: onDragStart,
+                onMouseoverSquare: onMouseoverSquare,
+                onMouseoutSquare: onMouseoutSquare,
+                onSquareClick: onSquareClick,
+                pieceTheme: pieceTheme,
+                orientation: playerColor.toLowerCase()
+            });
+            $('#hint-button').prop('disabled', true);
+        }
+    }
+    updateStatus();
+    $('#hint').addClass('hidden');
+    clearHintArrow();
+    setTimeout(afterMoveSwitchTimer, 500);
+}
+
 function onSnapEnd() {
     board.position(game.fen());
 }
@@ -667,11 +803,12 @@ function resetGame() {
         url: '/move',
         type: 'POST',
         contentType: 'application/json',
-        data: JSON.stringify({ move: 'reset', difficulty: difficulty, player_color: player_color }),
+        data: JSON.stringify({ move: 'reset', difficulty: difficulty, player_color: player_color, async: true }),
         success: function(response) {
             console.log("Reset response:", response);
             playerColor = response.player_color;
             currentGameId = response.game_id;
+            subscribeGameEvents();
             board = Chessboard('board', {
                 draggable: !useTapToMove,
                 position: response.fen,
@@ -681,7 +818,7 @@ function resetGame() {
                 onMouseoverSquare: onMouseoverSquare,
                 onMouseoutSquare: onMouseoutSquare,
                 onSquareClick: onSquareClick,
-                pieceTheme: '/static/img/chesspieces/wikipedia/{piece}.png',
+                pieceTheme: pieceTheme,
                 orientation: playerColor.toLowerCase()
             });
             game.load(response.fen);
@@ -693,6 +830,12 @@ function resetGame() {
             $('#hint-button').prop('disabled', false);
             showToast("Game reset successfully", "success");
             setTimeout(startGameWithTimers, 500);
+            if (response.pending) {
+                // Playing Black: the AI's first move arrives from /move_result
+                waitForAiMove(response.job_id);
+            } else {
+                toggleButtonSpinner('reset-button', false);
+            }
         },
         error: function(xhr, status, error) {
             console.error("Reset failed:", status, error);
@@ -701,8 +844,6 @@ function resetGame() {
             } else {
                 showToast("Failed to reset game", "error");
             }
-        },
-        complete: function() {
             toggleButtonSpinner('reset-button', false);
         }
     });
@@ -736,25 +877,49 @@ function saveGame() {
 
 function showResumeModal() {
     toggleButtonSpinner('resume-button', true);
+    loadGamePage(null, function() {
+        $('#resume-modal').removeClass('hidden');
+    });
+}
+
+function describeSavedGame(game) {
+    const progress = game.result ? `finished ${game.result}` : `${game.ply_count} plies` + (game.last_move ? `, last ${game.last_move}` : '');
+    return `[${game.game_id}] ${progress} - Created: ${game.created_at}, Last Updated: ${game.updated_at}`;
+}
+
+// Fetch one page of saved games: the first page replaces the list, later pages are appended
+// when the "Load more" entry is picked
+function loadGamePage(cursor, done) {
     $.ajax({
         url: '/user_games',
         type: 'POST',
         contentType: 'application/json',
-        data: JSON.stringify({}),
+        data: JSON.stringify(cursor ? { cursor: cursor } : {}),
         success: function(response) {
             console.log("User games response:", response);
             const $gameList = $('#game-list');
-            $gameList.empty();
-            if (response.games.length === 0) {
+            if (!cursor) {
+                $gameList.empty();
+            }
+            $gameList.find('option[value="more"]').remove();
+            if (!cursor && response.games.length === 0) {
                 $gameList.append('<option>No saved games found</option>');
                 $('#load-game-button').prop('disabled', true);
             } else {
                 response.games.forEach(game => {
-                    $gameList.append(`<option value="${game.game_id}">[${game.game_id}] Created: ${game.created_at}, Last Updated: ${game.updated_at}</option>`);
+                    $gameList.append(`<option value="${game.game_id}">${describeSavedGame(game)}</option>`);
                 });
+                if (response.next_cursor) {
+                    $('<option value="more">Load more games...</option>').attr('data-cursor', response.next_cursor).appendTo($gameList);
+                }
+                if (cursor) {
+                    $gameList.val(response.games.length ? String(response.games[0].game_id) : $gameList.find('option:first').val());
+                }
                 $('#load-game-button').prop('disabled', false);
             }
-            $('#resume-modal').removeClass('hidden');
+            if (done) {
+                done();
+            }
         },
         error: function(xhr, status, error) {
             console.error("Failed to fetch user games:", status, error);
@@ -772,7 +937,7 @@ function showResumeModal() {
 
 function resumeGame() {
     const gameId = $('#game-list').val();
-    if (!gameId || $('#game-list option').length === 0 || $('#game-list option:first').text() === 'No saved games found') {
+    if (!gameId || gameId === 'more' || $('#game-list option').length === 0 || $('#game-list option:first').text() === 'No saved games found') {
         showToast("Please select a game to resume", "error");
         return;
     }
@@ -789,6 +954,7 @@ function resumeGame() {
             } else {
                 playerColor = response.player_color;
                 currentGameId = response.game_id;
+                subscribeGameEvents();
                 board = Chessboard('board', {
                     draggable: !useTapToMove,
                     position: response.fen,
@@ -798,7 +964,7 @@ function resumeGame() {
                     onMouseoverSquare: onMouseoverSquare,
                     onMouseoutSquare: onMouseoutSquare,
                     onSquareClick: onSquareClick,
-                    pieceTheme: '/static/img/chesspieces/wikipedia/{piece}.png',
+                    pieceTheme: pieceTheme,
                     orientation: playerColor.toLowerCase()
                 });
                 game.load(response.fen);
@@ -810,6 +976,9 @@ function resumeGame() {
                 $('#resume-modal').addClass('hidden');
                 $('#hint-button').prop('disabled', false);
                 showToast("Game resumed successfully", "success");
+                if (response.job_id) {
+                    waitForAiMove(response.job_id);
+                }
                 setTimeout(startGameWithTimers, 500);
             }
         },
@@ -941,7 +1110,7 @@ function showTimeout(color) {
     board = Chessboard('board', {
         draggable: false,
         position: game.fen(),
-        pieceTheme: '/static/img/chesspieces/wikipedia/{piece}.png',
+        pieceTheme: pieceTheme,
         orientation: playerColor.toLowerCase()
     });
     stopAllTimers();